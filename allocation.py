@@ -0,0 +1,90 @@
+import math
+
+# Núcleo de reparto en centavos enteros.
+# Todos los repartos usan el método del resto mayor, así que las partes siempre suman exactamente el total.
+
+# Función para convertir un monto a centavos enteros
+def to_cents(value):
+    if value is None or isinstance(value, bool):
+        raise ValueError(f"Invalid amount: {value!r}")
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, str):
+        text = value.strip()
+        negative = text.startswith('-')
+        whole, _, fraction = text.lstrip('+-').partition('.')
+        if (whole or fraction) and (not whole or whole.isdecimal()) and (not fraction or fraction.isdecimal()):
+            # Conversión exacta del texto decimal, redondeando a medio centavo hacia arriba
+            cents = int(whole or 0) * 100 + int((fraction + '00')[:2])
+            if len(fraction) > 2 and fraction[2] >= '5':
+                cents += 1
+            return -cents if negative else cents
+        try:
+            value = float(text)
+        except ValueError:
+            raise ValueError(f"Invalid amount: {value!r}") from None
+    if not math.isfinite(value):
+        raise ValueError(f"Invalid amount: {value!r}")
+    return int(round(value * 100))
+
+# Función para convertir centavos a un monto en dólares
+def from_cents(cents):
+    return cents / 100
+
+# Función para mostrar centavos como monto con dos decimales, sin pasar por float
+def format_cents(cents):
+    sign = '-' if cents < 0 else ''
+    whole, fraction = divmod(abs(cents), 100)
+    return f'{sign}{whole}.{fraction:02d}'
+
+# Función para repartir un total en centavos según pesos enteros (método del resto mayor)
+def allocate_cents(total_cents, weights):
+    total_weight = sum(weights)
+    if total_weight == 0:
+        if total_cents:
+            raise ValueError("Cannot allocate a non-zero amount over zero weights")
+        return [0] * len(weights)
+    shares = []
+    remainders = []
+    for weight in weights:
+        share, remainder = divmod(total_cents * weight, total_weight)
+        shares.append(share)
+        remainders.append(remainder)
+    leftover = total_cents - sum(shares)
+    # Los centavos sobrantes van a los restos mayores; en caso de empate, al primero
+    for index in sorted(range(len(weights)), key=lambda i: -remainders[i])[:leftover]:
+        shares[index] += 1
+    return shares
+
+# Función para repartir muchos totales a la vez (una fila de pesos por total)
+def allocate_batch(totals_cents, weight_rows, np=None):
+    if np is None:
+        return [allocate_cents(total, weights) for total, weights in zip(totals_cents, weight_rows)]
+    totals = np.asarray(totals_cents, dtype=np.int64)
+    weights = np.asarray(weight_rows, dtype=np.int64)
+    total_weights = weights.sum(axis=1)
+    if np.any((total_weights == 0) & (totals != 0)):
+        raise ValueError("Cannot allocate a non-zero amount over zero weights")
+    safe_weights = np.where(total_weights == 0, 1, total_weights)[:, None]
+    shares, remainders = np.divmod(totals[:, None] * weights, safe_weights)
+    leftover = totals - shares.sum(axis=1)
+    order = np.argsort(-remainders, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(weights.shape[1])[None, :].repeat(len(totals), axis=0), axis=1)
+    shares += ranks < leftover[:, None]
+    return shares.tolist()
+
+# Función para repartir un descuento entre componentes y luego entre unidades
+# component_totals: total en centavos de cada componente de la factura
+# component_shares: partes en centavos de cada unidad por componente (la diferencia con el total es la vacancia)
+def allocate_discount(discount_cents, component_totals, component_shares):
+    unit_count = len(component_shares[0]) if component_shares else 0
+    unit_discounts = [0] * unit_count
+    if not discount_cents or not any(component_totals):
+        return unit_discounts
+    for component_discount, total, shares in zip(allocate_cents(discount_cents, component_totals), component_totals, component_shares):
+        vacancy = total - sum(shares)
+        split = allocate_cents(component_discount, list(shares) + [vacancy])
+        for index in range(unit_count):
+            unit_discounts[index] += split[index]
+    return unit_discounts
@@ -1,172 +1,192 @@
-import json
+import hashlib
 import os
-from datetime import datetime, timedelta
-from flask import Flask, request, render_template_string, redirect, url_for
+import threading
+from collections import OrderedDict
+from flask import Flask, abort, request, redirect, url_for, jsonify
+from jinja2 import DictLoader, FileSystemBytecodeCache
+import assets
+from assets import compress_variants, compressed_response
+from export import EXPORTS, export_filters
+from config_store import load_config, save_config
+from ledger import record_bill
+import metrics
+from metrics import set_label, timed
+from billing import bill_key, calculate_batch, compute_bill
+from result_cache import bill_cache, cached_bill
+from schedule import schedule_for
+from services import SERVICES, get_service
 
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)
+metrics.init_app(app)
+metrics.register_collector(bill_cache.metric_lines)
+assets.init_app(app)
 
-# Archivo de configuración
-config_file = 'config.json'
-
-# Función para cargar o inicializar la configuración
-def load_config():
-    if os.path.exists(config_file):
-        with open(config_file, 'r') as file:
-            try:
-                config = json.load(file)
-            except json.JSONDecodeError:
-                config = initialize_config()
-                save_config(config)
-    else:
-        config = initialize_config()
-        save_config(config)
-    return config
-
-# Función para inicializar la configuración por defecto
-def initialize_config():
-    return {
-        "upper_unit_start_date": "01/02/2024",
-        "lower_unit_start_date": "14/02/2024"
-    }
-
-# Función para guardar la configuración
-def save_config(config):
-    with open(config_file, 'w') as file:
-        json.dump(config, file, indent=4)
-
-# Función para Calcular Proporciones y Verificar Fechas
-def parse_date(date_string):
-    for fmt in ('%d/%m/%Y', '%m/%d/%Y'):
-        try:
-            return datetime.strptime(date_string, fmt)
-        except ValueError:
-            pass
-    raise ValueError(f"Date {date_string} does not match expected formats")
-
-def calculate_proportions(amount, from_date, to_date, upper_start, lower_start, upper_end, lower_end, consider_dates, consider_end_dates):
-    if not consider_dates and not consider_end_dates:
-        return round(amount / 2, 2), round(amount / 2, 2)
-    
-    from_date = parse_date(from_date)
-    to_date = parse_date(to_date)
-    total_days = (to_date - from_date).days + 1
-    
-    # Calculando los días habitados para la unidad superior
-    if consider_dates and upper_start:
-        upper_start = parse_date(upper_start)
-        from_date_upper = max(from_date, upper_start)
-    else:
-        from_date_upper = from_date
-
-    if consider_end_dates and upper_end:
-        upper_end = parse_date(upper_end)
-        to_date_upper = min(to_date, upper_end)
-    else:
-        to_date_upper = to_date
-
-    upper_days = (to_date_upper - from_date_upper).days + 1 if from_date_upper <= to_date_upper else 0
-    
-    # Calculando los días habitados para la unidad inferior
-    if consider_dates and lower_start:
-        lower_start = parse_date(lower_start)
-        from_date_lower = max(from_date, lower_start)
-    else:
-        from_date_lower = from_date
+# Rutas de Flask (cada propiedad tiene las mismas rutas bajo /p/<property_id>/)
+@app.route('/', methods=['GET', 'POST'], defaults={'property_id': None})
+@app.route('/p/<property_id>/', methods=['GET', 'POST'])
+def index(property_id):
+    with timed('config_load'):
+        config = property_config(property_id)
+    if request.method == 'POST':
+        if request.form.get('consider_dates') == 'on':
+            upper_unit_date = request.form.get('upper_unit_start_date')
+            lower_unit_date = request.form.get('lower_unit_start_date')
+            if upper_unit_date:
+                config['upper_unit_start_date'] = upper_unit_date
+            if lower_unit_date:
+                config['lower_unit_start_date'] = lower_unit_date
+            with timed('config_save'):
+                save_config(config, property_id)
+            schedule_for(property_id).refresh_in_background(config)
 
-    if consider_end_dates and lower_end:
-        lower_end = parse_date(lower_end)
-        to_date_lower = min(to_date, lower_end)
-    else:
-        to_date_lower = to_date
+        set_label('service', service_label(request.form.get('service_choice')))
+        with timed('proportions'):
+            bill = cached_bill(request.form, compute_bill, bill_key)
+        text = bill['text']
+        with timed('ledger'):
+            record_bill(
+                bill['service_name'],
+                bill['total'],
+                bill['from_date'],
+                bill['to_date'],
+                bill['due_date'],
+                {'upper': bill['upper_amount'], 'lower': bill['lower_amount']},
+                {'upper': bill['upper_discount'], 'lower': bill['lower_discount']} if bill['upper_discount'] is not None else None,
+                bill['early_payment_date'],
+                text=text,
+                date_format=request.form.get('date_format'),
+                key=bill_key(request.form),
+                property_id=property_id,
+            )
 
-    lower_days = (to_date_lower - from_date_lower).days + 1 if from_date_lower <= to_date_lower else 0
+        with timed('render'):
+            shell = render_shell(config)
+            return shell['head'] + result_template.render(text=text) + shell['tail']
 
-    upper_proportion = upper_days / total_days
-    lower_proportion = lower_days / total_days
+    schedule_for(property_id).refresh_in_background(config)
+    with timed('render'):
+        return shell_response(render_shell(config))
 
-    upper_amount = (amount / 2) * upper_proportion
-    lower_amount = (amount / 2) * lower_proportion
+# Función para cargar la configuración de una propiedad (404 si no existe)
+def property_config(property_id):
+    try:
+        return load_config(property_id)
+    except KeyError:
+        abort(404)
 
-    return round(upper_amount, 2), round(lower_amount, 2)
+# Función para la etiqueta de servicio de las métricas: solo ids conocidos, así el cliente no crea series nuevas
+def service_label(service_choice):
+    try:
+        return get_service(service_choice)['id']
+    except (TypeError, ValueError):
+        return 'invalid'
 
-# Función para Generar el Texto
-def generate_text(service_name, amount, upper_amount, lower_amount, from_date, to_date, due_date, upper_discount=None, lower_discount=None, early_payment_date=None, late_amount=None):
-    text = f"{service_name}\n\nTotal: {amount}\nLower Unit: {lower_amount}\nUpper Unit: {upper_amount}\n\nPeriod: {from_date.upper()} TO {to_date.upper()}\n\nDUE DATE: {due_date.upper()}\n\nMake sure that the deposit is made before the due date."
-    if upper_discount is not None and lower_discount is not None:
-        text += f"\n\nDiscount distribution if paid early:\nLower Unit: Water - {lower_discount}\nUpper Unit: Water - {upper_discount}\n\nTotal after discount:\nLower Unit: {round(lower_amount - lower_discount, 2)}\nUpper Unit: {round(upper_amount - upper_discount, 2)}"
-    if late_amount:
-        text += f"\n\nIf payment is made after {due_date.upper()}, then the payment should be {late_amount} CAD"
-    return text
+# Función para pre-renderizar y comprimir la parte estática de la página
+# La página usa rutas relativas, así las propiedades con las mismas fechas comparten el resultado.
+def render_shell(config):
+    key = (config.get('upper_unit_start_date'), config.get('lower_unit_start_date'))
+    with shell_lock:
+        shell = shell_cache.get(key)
+        if shell is not None:
+            shell_cache.move_to_end(key)
+    if shell is None:
+        html = page_template.render(config=config, services=SERVICES)
+        head, tail = html.split(RESULT_MARKER)
+        body = html.encode('utf-8')
+        shell = {
+            'head': head,
+            'tail': tail,
+            'etag': hashlib.sha256(body).hexdigest()[:16],
+            'variants': compress_variants(body),
+        }
+        with shell_lock:
+            shell_cache[key] = shell
+            while len(shell_cache) > SHELL_CACHE_SIZE:
+                shell_cache.popitem(last=False)
+    return shell
 
-# Rutas de Flask
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    config = load_config()
-    if request.method == 'POST':
-        consider_dates = request.form.get('consider_dates') == 'on'
-        consider_end_dates = request.form.get('consider_end_dates') == 'on'
+# Función para servir la página pre-renderizada con ETag y compresión
+def shell_response(shell):
+    return compressed_response(app, request, shell['variants'], shell['etag'], 'text/html', 'no-cache')
 
-        upper_unit_date = request.form.get('upper_unit_start_date') if consider_dates else None
-        lower_unit_date = request.form.get('lower_unit_start_date') if consider_dates else None
-        upper_end_date = request.form.get('upper_unit_end_date') if consider_end_dates else None
-        lower_end_date = request.form.get('lower_unit_end_date') if consider_end_dates else None
-        
-        if consider_dates:
-            if upper_unit_date:
-                config['upper_unit_start_date'] = upper_unit_date
-            if lower_unit_date:
-                config['lower_unit_start_date'] = lower_unit_date
-            save_config(config)
+# Función para convertir un cuerpo JSON en campos de texto, como los envía el formulario
+# Los números se aceptan como texto, null equivale a un campo ausente y el resto se rechaza.
+def json_form(body):
+    form = {}
+    for key, value in body.items():
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f"Field {key} must be a string or a number")
+        form[key] = value if isinstance(value, str) else str(value)
+    return form
 
-        date_range = request.form.get('date_range').split(' to ')
-        from_date = date_range[0]
-        to_date = date_range[1]
-        
-        service_choice = int(request.form.get('service_choice'))
-        if service_choice == 3:
-            water_amount = float(request.form.get('water_amount'))
-            waste_amount = float(request.form.get('waste_amount'))
-            due_date = request.form.get('due_date')
-            early_payment_date = request.form.get('early_payment_date')
-            early_payment_discount = float(request.form.get('early_payment_discount'))
-            total_amount = water_amount + waste_amount
+# API de vista previa: mismo cálculo que el formulario, sin escribir configuración ni ledger
+@app.route('/api/preview', methods=['POST'], defaults={'property_id': None})
+@app.route('/p/<property_id>/api/preview', methods=['POST'])
+def api_preview(property_id):
+    form = request.form
+    if not form:
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            return jsonify(error="Expected a JSON object or form data"), 400
+        try:
+            form = json_form(body)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+    set_label('service', service_label(form.get('service_choice')))
+    # Solo para responder 404 si la propiedad no existe: el cálculo usa las fechas del formulario
+    with timed('config_load'):
+        property_config(property_id)
+    try:
+        with timed('proportions'):
+            bill = cached_bill(form, compute_bill, bill_key)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(bill)
 
-            # Calcular proporciones de los servicios
-            upper_water, lower_water = calculate_proportions(water_amount, from_date, to_date, upper_unit_date, lower_unit_date, upper_end_date, lower_end_date, consider_dates, consider_end_dates)
-            upper_waste, lower_waste = calculate_proportions(waste_amount, from_date, to_date, upper_unit_date, lower_unit_date, upper_end_date, lower_end_date, consider_dates, consider_end_dates)
+# API del calendario: borradores precalculados de los próximos períodos de un servicio
+@app.route('/api/schedule', defaults={'property_id': None})
+@app.route('/p/<property_id>/api/schedule')
+def api_schedule(property_id):
+    with timed('config_load'):
+        config = property_config(property_id)
+    try:
+        drafts = schedule_for(property_id).drafts(request.args.get('service', 1), config)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(drafts=drafts)
 
-            # Calcular descuentos de pago anticipado
-            water_discount_proportion = water_amount / total_amount
-            waste_discount_proportion = waste_amount / total_amount
-            water_discount = early_payment_discount * water_discount_proportion
-            waste_discount = early_payment_discount * waste_discount_proportion
-            upper_water_discount = round(upper_water / water_amount * water_discount, 2) if water_amount != 0 else 0
-            lower_water_discount = round(lower_water / water_amount * water_discount, 2) if water_amount != 0 else 0
-            upper_waste_discount = round(upper_waste / waste_amount * waste_discount, 2) if waste_amount != 0 else 0
-            lower_waste_discount = round(lower_waste / waste_amount * waste_discount, 2) if waste_amount != 0 else 0
+# Exportación de estados de cuenta en streaming (CSV, XLSX o ZIP de textos por unidad)
+@app.route('/export/<export_format>', defaults={'property_id': None})
+@app.route('/p/<property_id>/export/<export_format>')
+def export_statements(export_format, property_id):
+    if export_format not in EXPORTS:
+        return jsonify(error=f"Unknown export format {export_format}"), 404
+    property_config(property_id)
+    try:
+        filters = export_filters(request.args, property_id)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    stream, mimetype, filename = EXPORTS[export_format]
+    response = app.response_class(stream(filters), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
-            text = generate_text(
-                "Water & Solid Waste",
-                total_amount,
-                upper_water + upper_waste,
-                lower_water + lower_waste,
-                from_date,
-                to_date,
-                due_date,
-                upper_water_discount + upper_waste_discount,
-                lower_water_discount + lower_waste_discount,
-                early_payment_date
-            )
-        else:
-            amount = float(request.form.get('amount'))
-            due_date = request.form.get('due_date')
-            upper_amount, lower_amount = calculate_proportions(amount, from_date, to_date, upper_unit_date, lower_unit_date, upper_end_date, lower_end_date, consider_dates, consider_end_dates)
-            service_name = ["Toronto Hydro", "Enbridge GAS", "Toronto Water & Solid Waste Management Services"][service_choice - 1]
-            text = generate_text(service_name, amount, upper_amount, lower_amount, from_date, to_date, due_date)
-        
-        return render_template_string(template, text=text, config=config, datetime=datetime, timedelta=timedelta)
-    
-    return render_template_string(template, config=config, datetime=datetime, timedelta=timedelta)
+# API para generar facturas en lote
+@app.route('/api/bills', methods=['POST'])
+def api_bills():
+    bills = request.get_json(silent=True)
+    if isinstance(bills, dict):
+        bills = bills.get('bills')
+    if not isinstance(bills, list) or not all(isinstance(bill, dict) for bill in bills):
+        return jsonify(error="Expected a JSON array of bill objects"), 400
+    try:
+        with timed('proportions'):
+            results = calculate_batch(bills)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(bills=results)
 
 # Template HTML
 template = '''
@@ -176,173 +196,19 @@ template = '''
     <meta charset="utf-8">
     <title>Billing Text Generator</title>
     <!-- Flatpickr CSS -->
-    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/flatpickr/dist/flatpickr.min.css">
-    <style>
-        body {
-            font-family: Arial, sans-serif;
-            margin: 0;
-            padding: 0;
-            background-color: #f4f4f4;
-        }
-        .header {
-            background-color: #1E90FF;
-            padding: 10px;
-            border-top-left-radius: 20px;
-            border-top-right-radius: 20px;
-            text-align: center;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        .header img {
-            width: 50px;
-            height: auto;
-        }
-        .header h1 {
-            margin: 0;
-            padding-left: 10px;
-            color: white;
-            font-size: 24px;
-        }
-        .container {
-            max-width: 800px;
-            margin: 20px auto;
-            padding: 20px;
-            background-color: white;
-            box-shadow: 0 0 10px rgba(0, 0, 0, 0.1);
-            border-radius: 0 0 10px 10px;
-            position: relative;
-        }
-        .service-logo {
-            display: block;
-            width: 100px;
-            height: auto;
-            margin-top: 10px;
-        }
-        h2 {
-            text-align: center;
-            color: #333;
-        }
-        form {
-            display: grid;
-            gap: 20px;
-        }
-        .form-group {
-            display: flex;
-            flex-direction: column;
-        }
-        .form-group label {
-            margin-bottom: 5px;
-        }
-        .form-group input,
-        .form-group select,
-        .form-group textarea {
-            padding: 10px;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-            font-size: 16px;
-        }
-        .form-group input[type="checkbox"] {
-            width: auto;
-        }
-        .toggle-button {
-            position: relative;
-            display: inline-block;
-            width: 50px;
-            height: 25px;
-        }
-        .toggle-button input {
-            opacity: 0;
-            width: 0;
-            height: 0;
-        }
-        .slider {
-            position: absolute;
-            cursor: pointer;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background-color: #ccc;
-            transition: .4s;
-            border-radius: 25px;
-        }
-        .slider:before {
-            position: absolute;
-            content: "";
-            height: 17px;
-            width: 17px;
-            left: 4px;
-            bottom: 4px;
-            background-color: white;
-            transition: .4s;
-            border-radius: 50%;
-        }
-        input:checked + .slider {
-            background-color: #007bff;
-        }
-        input:checked + .slider:before {
-            transform: translateX(26px);
-        }
-        .form-group button {
-            padding: 10px 20px;
-            border: none;
-            background-color: #007bff;
-            color: white;
-            border-radius: 5px;
-            cursor: pointer;
-            font-size: 16px;
-        }
-        .form-group button:hover {
-            background-color: #0056b3;
-        }
-        .generated-text {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-        }
-        .generated-text textarea {
-            width: 100%;
-            max-width: 700px;
-            font-size: 16px;
-        }
-        #date_fields, #end_date_fields, #water_solid_waste_details {
-            display: none;
-        }
-        @media (max-width: 600px) {
-            .container {
-                padding: 10px;
-            }
-            .form-group {
-                gap: 10px;
-            }
-            .form-group input,
-            .form-group select,
-            .form-group textarea {
-                padding: 8px;
-                font-size: 14px;
-            }
-            .form-group button {
-                padding: 8px 16px;
-                font-size: 14px;
-            }
-            .header img {
-                width: 30px;
-            }
-            .header h1 {
-                font-size: 18px;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('vendor/flatpickr/flatpickr.min.css') }}">
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
 </head>
 <body onload="toggleServiceLogo()">
     <div class="header">
-        <img src="https://www.thefastmode.com/media/k2/items/src/b19b32314915badb2f3f99d7ca403bd2.jpg?t=20220913_013643" alt="Logo">
+        <img src="{{ asset_url('logos/header.svg') }}" alt="Logo">
         <h1>Billing Text Generator</h1>
     </div>
     <div class="container">
         <h2>Billing Text Generator</h2>
-        <form method="post">
+        <!-- Relative URLs: the same page is served at / and at /p/<property_id>/ -->
+        <form method="post" id="billing_form" data-preview-url="api/preview" data-schedule-url="api/schedule">
+            <input type="hidden" name="date_format" value="dmy">
             <div class="form-group">
                 <label for="consider_dates">Consider rental start dates for calculation:</label>
                 <label class="toggle-button">
@@ -380,35 +246,35 @@ template = '''
             <div class="form-group">
                 <label for="service_choice">Select the service:</label>
                 <select id="service_choice" name="service_choice" onchange="toggleServiceLogo()">
-                    <option value="1">Toronto Hydro</option>
-                    <option value="2">Enbridge GAS</option>
-                    <option value="3">Toronto Water & Solid Waste Management Services</option>
+                    {% for service in services %}
+                    <option value="{{ service.id }}" data-logo="{{ asset_url(service.logo) if service.logo else '' }}">{{ service.name }}</option>
+                    {% endfor %}
                 </select>
                 <img id="service_logo" class="service-logo">
             </div>
-            <div id="water_solid_waste_details">
-                <h2>Water & Solid Waste Management Services Details</h2>
+            {% for service in services %}
+            <div class="service-details" data-service="{{ service.id }}">
+                {% if service.details_title %}
+                <h2>{{ service.details_title }}</h2>
+                {% endif %}
+                {% for component in service.components %}
                 <div class="form-group">
-                    <label for="water_amount">Amount for Water/Sewer Services:</label>
-                    <input type="number" inputmode="decimal" step="0.01" id="water_amount" name="water_amount">
+                    <label for="service{{ service.id }}_{{ component.field }}">{{ component.label }}:</label>
+                    <input type="number" inputmode="decimal" step="0.01" id="service{{ service.id }}_{{ component.field }}" name="{{ component.field }}">
                 </div>
+                {% endfor %}
+                {% if service.early_payment_discount %}
                 <div class="form-group">
-                    <label for="waste_amount">Amount for Solid Waste Management Services:</label>
-                    <input type="number" inputmode="decimal" step="0.01" id="waste_amount" name="waste_amount">
+                    <label for="service{{ service.id }}_early_payment_date">Date for 'Amount Due if paid before':</label>
+                    <input type="text" id="service{{ service.id }}_early_payment_date" name="early_payment_date" class="datepicker">
                 </div>
                 <div class="form-group">
-                    <label for="early_payment_date">Date for 'Amount Due if paid before':</label>
-                    <input type="text" id="early_payment_date" name="early_payment_date" class="datepicker">
-                </div>
-                <div class="form-group">
-                    <label for="early_payment_discount">Early payment discount:</label>
-                    <input type="number" inputmode="decimal" step="0.01" id="early_payment_discount" name="early_payment_discount">
+                    <label for="service{{ service.id }}_early_payment_discount">Early payment discount:</label>
+                    <input type="number" inputmode="decimal" step="0.01" id="service{{ service.id }}_early_payment_discount" name="early_payment_discount">
                 </div>
+                {% endif %}
             </div>
-            <div class="form-group">
-                <label for="amount">Total amount of the bill:</label>
-                <input type="number" inputmode="decimal" step="0.01" id="amount" name="amount">
-            </div>
+            {% endfor %}
             <div class="form-group">
                 <label for="date_range">Select Date Range:</label>
                 <input type="text" id="date_range" name="date_range" class="daterange" placeholder="Select Date Range">
@@ -421,85 +287,50 @@ template = '''
                 <button type="submit">Generate Text</button>
             </div>
         </form>
-        {% if text %}
-        <div class="generated-text">
-            <h2>Generated Text</h2>
-            <textarea id="generated_text" rows="10" cols="50" readonly>{{ text }}</textarea>
-            <button type="button" onclick="copyToClipboard()">Copy to Clipboard</button>
+        <div id="preview" class="generated-text">
+            <h2>Preview</h2>
+            <textarea id="preview_text" rows="10" cols="50" readonly></textarea>
         </div>
-        {% endif %}
+        <!-- generated-text -->
     </div>
     
     <!-- Flatpickr JS -->
-    <script src="https://cdn.jsdelivr.net/npm/flatpickr"></script>
-    <script>
-        document.addEventListener('DOMContentLoaded', function() {
-            // Initialize Flatpickr for single date selection
-            flatpickr('.datepicker', {
-                dateFormat: 'd/m/Y',
-                allowInput: true
-            });
-            // Initialize Flatpickr for date range selection
-            flatpickr('.daterange', {
-                mode: 'range',
-                dateFormat: 'd/m/Y',
-                allowInput: true
-            });
-        });
-
-        function toggleDateFields() {
-            var checkBox = document.getElementById("consider_dates");
-            var dateFields = document.getElementById("date_fields");
-            if (checkBox.checked == true){
-                dateFields.style.display = "block";
-            } else {
-                dateFields.style.display = "none";
-            }
-        }
-
-        function toggleEndDateFields() {
-            var checkBox = document.getElementById("consider_end_dates");
-            var endDateFields = document.getElementById("end_date_fields");
-            if (checkBox.checked == true){
-                endDateFields.style.display = "block";
-            } else {
-                endDateFields.style.display = "none";
-            }
-        }
-
-        function toggleServiceLogo() {
-            var serviceChoice = document.getElementById("service_choice").value;
-            var serviceLogo = document.getElementById("service_logo");
-            var waterSolidWasteDetails = document.getElementById("water_solid_waste_details");
-            if (serviceChoice == "1") {
-                serviceLogo.src = "https://shesconnectedblog.com/wp-content/uploads/2016/06/toronto-hydro-white.jpg";
-                serviceLogo.style.display = "block";
-                waterSolidWasteDetails.style.display = "none";
-            } else if (serviceChoice == "2") {
-                serviceLogo.src = "https://th.bing.com/th/id/R.ab75742a07102524619bc6231af6f0c6?rik=AjMSP%2fY40a6qCQ&riu=http%3a%2f%2fwww.keweenawreport.com%2fwp-content%2fuploads%2f2020%2f07%2fEnbridge-Logo-2048x928.jpg&ehk=t5QbHlUjH4WpThncLvPlexbq08Scc%2fX6bHtCHKi0W7I%3d&risl=&pid=ImgRaw&r=0";
-                serviceLogo.style.display = "block";
-                waterSolidWasteDetails.style.display = "none";
-            } else if (serviceChoice == "3") {
-                serviceLogo.src = "https://th.bing.com/th/id/OIP.E88519bruxfJo2y1pVEmlQAAAA?w=250&h=250&rs=1&pid=ImgDetMain";
-                serviceLogo.style.display = "block";
-                waterSolidWasteDetails.style.display = "block";
-            } else {
-                serviceLogo.style.display = "none";
-                waterSolidWasteDetails.style.display = "none";
-            }
-        }
-
-        function copyToClipboard() {
-            var copyText = document.getElementById("generated_text");
-            copyText.select();
-            document.execCommand("copy");
-            alert("Copied the text: " + copyText.value);
-        }
-    </script>
+    <script src="{{ asset_url('vendor/flatpickr/flatpickr.min.js') }}"></script>
+    <script src="{{ asset_url('app.js') }}"></script>
 </body>
 </html>
 '''
 
+# Fragmento HTML del texto generado
+result_fragment = '''
+        <div class="generated-text">
+            <h2>Generated Text</h2>
+            <textarea id="generated_text" rows="10" cols="50" readonly>{{ text }}</textarea>
+            <button type="button" onclick="copyToClipboard()">Copy to Clipboard</button>
+        </div>
+'''
+
+# Compilar los templates una sola vez al iniciar
+RESULT_MARKER = '<!-- generated-text -->'
+SHELL_CACHE_SIZE = int(os.environ.get('SHELL_CACHE_SIZE', 256))
+shell_cache = OrderedDict()
+shell_lock = threading.Lock()
+template_cache_dir = os.environ.get('TEMPLATE_CACHE_DIR')
+if template_cache_dir:
+    os.makedirs(template_cache_dir, exist_ok=True)
+template_env = app.jinja_env.overlay(
+    loader=DictLoader({'index.html': template, 'result.html': result_fragment}),
+    bytecode_cache=FileSystemBytecodeCache(template_cache_dir) if template_cache_dir else None,
+)
+template_env.globals['asset_url'] = assets.asset_url
+page_template = template_env.get_template('index.html')
+result_template = template_env.get_template('result.html')
+
 if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    import sys
+    if '--dev' in sys.argv:
+        port = int(os.environ.get('PORT', 5000))
+        app.run(host='0.0.0.0', port=port)
+    else:
+        from serve import main
+        sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Archivos estáticos con hash de contenido en el nombre, comprimidos de antemano y cacheables para siempre.
+# Uso para generar los archivos en disco (por ejemplo, para un proxy): python -m assets build [directorio]
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+URL_PREFIX = '/assets/'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+manifest = {}
+assets = {}
+
+# Función para generar las variantes comprimidas de un contenido
+def compress_variants(body):
+    variants = {'identity': body, 'gzip': gzip.compress(body, 9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body)
+    return variants
+
+# Función para elegir la mejor variante que acepta el cliente y responder con ETag y 304
+def compressed_response(app, request, variants, etag, mimetype, cache_control):
+    encoding = 'identity'
+    if 'br' in variants and 'br' in request.accept_encodings:
+        encoding = 'br'
+    elif 'gzip' in variants and 'gzip' in request.accept_encodings:
+        encoding = 'gzip'
+    response = app.response_class(variants[encoding], mimetype=mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(f'{etag}-{encoding}')
+    return response.make_conditional(request)
+
+# Función para agregar el hash del contenido al nombre del archivo
+def fingerprint(name, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    base, extension = os.path.splitext(name)
+    return f'{base}.{digest}{extension}', digest
+
+# Función para cargar todos los archivos estáticos en memoria
+def load_assets(directory=STATIC_DIR):
+    manifest.clear()
+    assets.clear()
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, directory).replace(os.sep, '/')
+            with open(path, 'rb') as file:
+                content = file.read()
+            hashed_name, digest = fingerprint(name, content)
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            if mimetype.startswith(COMPRESSIBLE):
+                variants = compress_variants(content)
+            else:
+                variants = {'identity': content}
+            manifest[name] = hashed_name
+            assets[hashed_name] = {'variants': variants, 'etag': digest, 'mimetype': mimetype}
+    return manifest
+
+# Función para obtener la URL con hash de un archivo estático
+def asset_url(name):
+    return URL_PREFIX + manifest[name]
+
+# Función para registrar la ruta de archivos estáticos en la aplicación
+def init_app(app):
+    from flask import abort, request
+
+    load_assets()
+
+    @app.route(URL_PREFIX + '<path:filename>')
+    def static_asset(filename):
+        asset = assets.get(filename)
+        if asset is None:
+            abort(404)
+        return compressed_response(app, request, asset['variants'], asset['etag'], asset['mimetype'], IMMUTABLE)
+
+# Función para escribir los archivos con hash y sus variantes .gz/.br en un directorio
+def build(output_dir):
+    load_assets()
+    for hashed_name, asset in assets.items():
+        target = os.path.join(output_dir, *hashed_name.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        for encoding, suffix in (('identity', ''), ('gzip', '.gz'), ('br', '.br')):
+            if encoding in asset['variants']:
+                with open(target + suffix, 'wb') as file:
+                    file.write(asset['variants'][encoding])
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
+    return len(assets)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'build':
+        sys.exit('usage: python -m assets build [output directory]')
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else 'build/assets'
+    print(f'{build(output_dir)} assets written to {output_dir}')
@@ -0,0 +1,105 @@
+import argparse
+import json
+import sys
+from collections import deque
+from itertools import islice
+
+from billing import calculate_batch
+
+# Modo batch sin Flask: lee solicitudes JSONL, calcula y escribe resultados JSONL.
+# Uso: python -m batch [entrada.jsonl] [-o salida.jsonl] [--workers N]
+
+CHUNK_SIZE = 1000
+
+# Función para leer las líneas no vacías de la entrada
+def read_lines(stream):
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line:
+            yield line_number, line
+
+# Función para agrupar las líneas en bloques de tamaño fijo
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# Función para calcular un bloque de solicitudes (devuelve errores y líneas de salida)
+def process_chunk(chunk):
+    outputs = [None] * len(chunk)
+    bills = []
+    positions = []
+    for position, (line_number, line) in enumerate(chunk):
+        try:
+            bill = json.loads(line)
+        except json.JSONDecodeError as e:
+            outputs[position] = {"line": line_number, "error": f"Invalid JSON: {e}"}
+            continue
+        if not isinstance(bill, dict):
+            outputs[position] = {"line": line_number, "error": "Expected a JSON object"}
+            continue
+        bills.append(bill)
+        positions.append(position)
+
+    try:
+        results = calculate_batch(bills)
+    except (AttributeError, TypeError, ValueError):
+        # Una solicitud inválida no debe invalidar todo el bloque
+        results = []
+        for bill in bills:
+            try:
+                results.append(calculate_batch([bill])[0])
+            except (AttributeError, TypeError, ValueError) as e:
+                results.append({"error": str(e).replace("Bill 0: ", "", 1)})
+
+    for position, bill, result in zip(positions, bills, results):
+        result = dict(result, line=chunk[position][0])
+        if 'id' in bill:
+            result['id'] = bill['id']
+        outputs[position] = result
+    errors = sum(1 for output in outputs if 'error' in output)
+    return errors, [json.dumps(output) for output in outputs]
+
+# Función para procesar los bloques en un pool de procesos sin adelantarse demasiado a la salida
+def process_parallel(chunks, workers):
+    import multiprocessing
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(process_chunk, (chunk,)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m batch', description='Generate billing splits from JSON-lines bill requests.')
+    parser.add_argument('input', nargs='?', default='-', help="JSONL file with one bill per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="JSONL file for the results ('-' for stdout)")
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='bills per batch')
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    errors = 0
+    try:
+        chunks = chunked(read_lines(source), args.chunk_size)
+        results = process_parallel(chunks, args.workers) if args.workers > 1 else map(process_chunk, chunks)
+        for chunk_errors, lines in results:
+            errors += chunk_errors
+            for line in lines:
+                target.write(line + '\n')
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
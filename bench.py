@@ -0,0 +1,269 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+# Benchmarks de cálculo, renderizado y solicitudes completas.
+# Uso:
+#   python bench.py run --save baseline.json
+#   python bench.py run --save current.json
+#   python bench.py compare baseline.json current.json --threshold 0.15
+#   python bench.py compare baseline.json          (ejecuta y compara en un solo paso)
+
+BENCHMARKS = {}
+REPEAT = 5
+MIN_TIME = 0.2
+
+# Decorador para registrar un benchmark (la función prepara y devuelve lo que se mide)
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+# Función para aislar la configuración y el ledger en un directorio temporal
+def isolate_state():
+    directory = tempfile.mkdtemp(prefix='billing-bench-')
+    with open(os.path.join(directory, 'config.json'), 'w') as file:
+        json.dump({"upper_unit_start_date": "01/02/2024", "lower_unit_start_date": "14/02/2024"}, file)
+    os.environ['CONFIG_FILE'] = os.path.join(directory, 'config.json')
+    os.environ['LEDGER_DB'] = os.path.join(directory, 'ledger.db')
+    os.environ['LEGACY_LEDGER_FILE'] = os.path.join(directory, 'ledger.json')
+    os.environ['PROPERTIES_DIR'] = os.path.join(directory, 'properties')
+    return directory
+
+def random_bills(count, seed=42):
+    rng = random.Random(seed)
+    bills = []
+    for _ in range(count):
+        month = rng.randint(1, 12)
+        bills.append({
+            "service_choice": rng.randint(1, 3),
+            "amount": round(rng.uniform(20, 600), 2),
+            "from_date": f"01/{month:02d}/2024",
+            "to_date": f"28/{month:02d}/2024",
+            "due_date": f"15/{month % 12 + 1:02d}/2024",
+            "consider_dates": True,
+            "upper_unit_start_date": f"{rng.randint(1, 28):02d}/{month:02d}/2024",
+            "lower_unit_start_date": "01/01/2024",
+            "consider_end_dates": rng.random() < 0.3,
+            "lower_unit_end_date": f"{rng.randint(1, 28):02d}/{month:02d}/2024",
+        })
+    return bills
+
+FORMS = {
+    1: {'service_choice': '1', 'amount': '123.45'},
+    2: {'service_choice': '2', 'amount': '88.10'},
+    3: {'service_choice': '3', 'water_amount': '80.03', 'waste_amount': '20.01', 'early_payment_discount': '5.01', 'early_payment_date': '05/03/2024'},
+}
+COMMON_FORM = {
+    'date_range': '01/02/2024 to 29/02/2024',
+    'due_date': '10/03/2024',
+    'consider_dates': 'on',
+    'upper_unit_start_date': '01/02/2024',
+    'lower_unit_start_date': '14/02/2024',
+}
+
+@benchmark('parse_date.day_first')
+def bench_parse_date():
+    from dates import parse_date
+    return lambda: parse_date('14/02/2024')
+
+@benchmark('parse_date.month_first')
+def bench_parse_date_month_first():
+    from dates import parse_date
+    return lambda: parse_date('02/14/2024', 'mdy')
+
+@benchmark('parse_ordinal.uncached')
+def bench_parse_ordinal_uncached():
+    from dates import parse_ordinal
+    return lambda: parse_ordinal.__wrapped__('14/02/2024', 'dmy')
+
+@benchmark('form_period.service_3')
+def bench_form_period():
+    from billing import form_period
+    form = dict(COMMON_FORM, **FORMS[3])
+    return lambda: form_period(form)
+
+@benchmark('calculate_proportions.even_split')
+def bench_proportions_even():
+    from billing import calculate_proportions
+    return lambda: calculate_proportions(123.45, '01/02/2024', '29/02/2024', None, None, None, None, False, False)
+
+@benchmark('calculate_proportions.with_dates')
+def bench_proportions_dates():
+    from billing import calculate_proportions
+    return lambda: calculate_proportions(123.45, '01/02/2024', '29/02/2024', '10/02/2024', '14/02/2024', None, '20/02/2024', True, True)
+
+@benchmark('compute_bill.service_3')
+def bench_compute_bill():
+    from billing import compute_bill
+    form = dict(COMMON_FORM, **FORMS[3])
+    return lambda: compute_bill(form)
+
+@benchmark('generate_text.plain')
+def bench_generate_text():
+    from billing import generate_text
+    return lambda: generate_text('Toronto Hydro', 123.45, 61.73, 61.72, '01/02/2024', '29/02/2024', '10/03/2024')
+
+@benchmark('generate_text.discount')
+def bench_generate_text_discount():
+    from billing import generate_text
+    return lambda: generate_text('Water & Solid Waste', 100.04, 34.5, 50.02, '01/02/2024', '29/02/2024', '10/03/2024', 1.72, 2.51, '05/03/2024', 105.0)
+
+@benchmark('request.index_get')
+def bench_index_get():
+    from app import app
+    client = app.test_client()
+    return lambda: client.get('/')
+
+# Función para generar formularios con un monto distinto en cada iteración
+# Así cada solicitud calcula la factura y la registra en el ledger en vez de salir de la caché de resultados.
+def _fresh_forms(service_choice):
+    form = dict(COMMON_FORM, **FORMS[service_choice])
+    field = 'water_amount' if 'water_amount' in form else 'amount'
+    for cents in itertools.count(10000):
+        yield dict(form, **{field: f'{cents // 100}.{cents % 100:02d}'})
+
+def _post_benchmark(service_choice):
+    def setup():
+        from app import app
+        client = app.test_client()
+        forms = _fresh_forms(service_choice)
+        return lambda: client.post('/', data=next(forms))
+    return setup
+
+for _choice in FORMS:
+    benchmark(f'request.index_post.service_{_choice}')(_post_benchmark(_choice))
+
+@benchmark('request.api_preview')
+def bench_api_preview():
+    from app import app
+    client = app.test_client()
+    forms = _fresh_forms(3)
+    return lambda: client.post('/api/preview', data=next(forms))
+
+@benchmark('request.api_preview_cached')
+def bench_api_preview_cached():
+    from app import app
+    client = app.test_client()
+    form = dict(COMMON_FORM, **FORMS[3])
+    client.post('/api/preview', data=form)
+    return lambda: client.post('/api/preview', data=form)
+
+@benchmark('request.property_get_5000')
+def bench_property_get():
+    from app import app
+    from config_store import create_property, property_exists
+    for index in range(5000):
+        if not property_exists(f'property{index}'):
+            create_property(f'property{index}', {'upper_unit_start_date': f'{index % 28 + 1:02d}/02/2024'})
+    client = app.test_client()
+    urls = itertools.cycle([f'/p/property{index}/' for index in range(0, 5000, 25)])
+    return lambda: client.get(next(urls))
+
+@benchmark('batch.calculate_batch_10k')
+def bench_calculate_batch():
+    from billing import calculate_batch
+    bills = random_bills(10000)
+    return lambda: calculate_batch(bills)
+
+@benchmark('batch.api_bills_1k')
+def bench_api_bills():
+    from app import app
+    client = app.test_client()
+    bills = random_bills(1000)
+    return lambda: client.post('/api/bills', json=bills)
+
+# Función para medir un benchmark (microsegundos por llamada)
+def measure(function, repeat=REPEAT, min_time=MIN_TIME):
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed * 1.2))
+    samples = [elapsed / number] + [timer.timeit(number) / number for _ in range(repeat - 1)]
+    return {
+        'min_us': min(samples) * 1e6,
+        'median_us': statistics.median(samples) * 1e6,
+        'loops': number,
+    }
+
+def run(selected=None, repeat=REPEAT, min_time=MIN_TIME):
+    isolate_state()
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = measure(setup(), repeat, min_time)
+        print(f"{name:45} {results[name]['min_us']:12.2f} us  (median {results[name]['median_us']:.2f} us)", file=sys.stderr)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+# Función para comparar dos corridas; devuelve la lista de regresiones
+def compare(baseline, current, threshold):
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:45} {'new':>10}")
+            continue
+        change = result['min_us'] / base['min_us'] - 1
+        flag = 'REGRESSION' if change > threshold else ''
+        print(f"{name:45} {base['min_us']:12.2f} -> {result['min_us']:12.2f} us  {change:+8.1%}  {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python bench.py', description='Billing generator benchmark suite.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--save', help='write the results to this JSON file')
+    run_parser.add_argument('-k', dest='selected', action='append', help='only run benchmarks whose name contains this text')
+    run_parser.add_argument('--repeat', type=int, default=REPEAT)
+    run_parser.add_argument('--min-time', type=float, default=MIN_TIME)
+    compare_parser = commands.add_parser('compare', help='fail if results regressed against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current', nargs='?', help='results file (runs the benchmarks when omitted)')
+    compare_parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown, e.g. 0.15 for 15%%')
+    compare_parser.add_argument('-k', dest='selected', action='append')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run(args.selected, args.repeat, args.min_time)
+        if args.save:
+            with open(args.save, 'w') as file:
+                json.dump(results, file, indent=4)
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if args.current:
+        with open(args.current) as file:
+            current = json.load(file)
+    else:
+        current = run(args.selected)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
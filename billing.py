@@ -0,0 +1,307 @@
+import json
+from allocation import allocate_batch, allocate_cents, allocate_discount, from_cents, to_cents
+from dates import make_period, parse_date, parse_ordinal, resolve_format
+from occupancy import occupancy_weights, occupied_days
+from services import get_service
+
+# Tamaño mínimo de lote para usar NumPy (se importa solo cuando hace falta)
+NUMPY_MIN_BATCH = 64
+_numpy = []
+
+# Función para Calcular Proporciones y Verificar Fechas
+# Por defecto la vacancia se reparte entre las unidades ocupadas, como en los servicios de services.json.
+def calculate_proportions(amount, from_date, to_date, upper_start, lower_start, upper_end, lower_end, consider_dates, consider_end_dates, redistribute_vacancy=True):
+    upper_cents, lower_cents, _ = proportions_cents(to_cents(amount), from_date, to_date, upper_start, lower_start, upper_end, lower_end, consider_dates, consider_end_dates, redistribute_vacancy=redistribute_vacancy)
+    return from_cents(upper_cents), from_cents(lower_cents)
+
+# Función para repartir un total en centavos entre ambas unidades (devuelve también la parte vacía)
+def proportions_cents(total_cents, from_date, to_date, upper_start, lower_start, upper_end, lower_end, consider_dates, consider_end_dates, date_format=None, redistribute_vacancy=True):
+    period = make_period(
+        from_date,
+        to_date,
+        upper_start if consider_dates else None,
+        lower_start if consider_dates else None,
+        upper_end if consider_end_dates else None,
+        lower_end if consider_end_dates else None,
+        date_format,
+    )
+    days = unit_days(period)
+    upper_cents, lower_cents, vacant_cents = allocate_cents(total_cents, split_weights('occupancy', *days, redistribute_vacancy=redistribute_vacancy))
+    return upper_cents, lower_cents, vacant_cents
+
+# Función para calcular los días del período y los días habitados de cada unidad
+def unit_days(period):
+    total_days = period.total_days
+    if period.upper_start is period.upper_end is period.lower_start is period.lower_end is None:
+        return total_days, total_days, total_days
+    units = {
+        'upper': [(period.upper_start, period.upper_end)],
+        'lower': [(period.lower_start, period.lower_end)],
+    }
+    days = occupied_days(period.start, period.end, units)
+    return total_days, days['upper'], days['lower']
+
+# Función para obtener los pesos de reparto (superior, inferior, vacancia) según la regla del componente
+def split_weights(rule, total_days, upper_days, lower_days, fixed_weights=None, redistribute_vacancy=False):
+    if rule == 'occupancy':
+        return occupancy_weights(total_days, [upper_days, lower_days], [1, 1], redistribute_vacancy)
+    if rule == 'equal':
+        return [1, 1, 0]
+    return list(fixed_weights) + [0]
+
+# Función para Generar el Texto
+def generate_text(service_name, amount, upper_amount, lower_amount, from_date, to_date, due_date, upper_discount=None, lower_discount=None, early_payment_date=None, late_amount=None):
+    text = f"{service_name}\n\nTotal: {amount}\nLower Unit: {lower_amount}\nUpper Unit: {upper_amount}\n\nPeriod: {from_date.upper()} TO {to_date.upper()}\n\nDUE DATE: {due_date.upper()}\n\nMake sure that the deposit is made before the due date."
+    if upper_discount is not None and lower_discount is not None:
+        text += f"\n\nDiscount distribution if paid early:\nLower Unit: Water - {lower_discount}\nUpper Unit: Water - {upper_discount}\n\nTotal after discount:\nLower Unit: {round(lower_amount - lower_discount, 2)}\nUpper Unit: {round(upper_amount - upper_discount, 2)}"
+    if late_amount:
+        text += f"\n\nIf payment is made after {due_date.upper()}, then the payment should be {late_amount} CAD"
+    return text
+
+# Función para leer un campo obligatorio del formulario
+def _required(form, name):
+    value = form.get(name)
+    if value is None or not str(value).strip():
+        raise ValueError(f"Missing field {name}")
+    return value
+
+# Función para separar el rango de fechas del formulario ('DESDE to HASTA')
+def _date_range(form):
+    date_range = _required(form, 'date_range').split(' to ')
+    if len(date_range) != 2:
+        raise ValueError("date_range must look like 'DD/MM/YYYY to DD/MM/YYYY'")
+    return date_range[0], date_range[1]
+
+# Función para convertir todas las fechas del formulario de una sola vez en un período
+# El formato se indica con el campo date_format ('dmy' por defecto, como el selector de fechas).
+def form_period(form):
+    consider_dates = form.get('consider_dates') == 'on'
+    consider_end_dates = form.get('consider_end_dates') == 'on'
+    from_date, to_date = _date_range(form)
+    return make_period(
+        from_date,
+        to_date,
+        form.get('upper_unit_start_date') if consider_dates else None,
+        form.get('lower_unit_start_date') if consider_dates else None,
+        form.get('upper_unit_end_date') if consider_end_dates else None,
+        form.get('lower_unit_end_date') if consider_end_dates else None,
+        resolve_format(form.get('date_format')),
+    )
+
+# Función para calcular una factura a partir de los campos del formulario
+# Es el único camino de cálculo del formulario y de la vista previa, así ambos dan siempre el mismo resultado.
+# Los días habitados se calculan una sola vez y se comparten entre todos los componentes del servicio.
+def compute_bill(form):
+    consider_dates = form.get('consider_dates') == 'on'
+    upper_unit_date = form.get('upper_unit_start_date') if consider_dates else None
+    lower_unit_date = form.get('lower_unit_start_date') if consider_dates else None
+    from_date, to_date = _date_range(form)
+    due_date = form.get('due_date') or ''
+    period = form_period(form)
+
+    try:
+        service = get_service(_required(form, 'service_choice'))
+    except ValueError as e:
+        raise ValueError(f"Invalid service_choice: {e}") from None
+    components = service['components']
+    amounts = [to_cents(_required(form, component['field'])) for component in components]
+
+    # Calcular proporciones de los componentes
+    days = unit_days(period)
+    shares = [
+        allocate_cents(cents, split_weights(component['split'], *days, component.get('weights'), component['redistribute_vacancy']))
+        for component, cents in zip(components, amounts)
+    ]
+    total = from_cents(sum(amounts))
+    upper_amount = from_cents(sum(share[0] for share in shares))
+    lower_amount = from_cents(sum(share[1] for share in shares))
+
+    bill = {
+        'service_choice': service['id'],
+        'service_name': service['name'],
+        'from_date': from_date,
+        'to_date': to_date,
+        'due_date': due_date,
+        'early_payment_date': None,
+        'total': total,
+        'upper_amount': upper_amount,
+        'lower_amount': lower_amount,
+        'upper_discount': None,
+        'lower_discount': None,
+        'components': {
+            component['key']: {'total': from_cents(cents), 'upper': from_cents(share[0]), 'lower': from_cents(share[1])}
+            for component, cents, share in zip(components, amounts, shares)
+        },
+        'consider_dates': consider_dates,
+        'upper_unit_start_date': upper_unit_date,
+        'lower_unit_start_date': lower_unit_date,
+    }
+
+    if service['early_payment_discount']:
+        # Calcular descuentos de pago anticipado entre los componentes que participan
+        eligible = [index for index, component in enumerate(components) if component['discount']]
+        upper_discount = lower_discount = 0
+        if eligible:
+            upper_discount, lower_discount = allocate_discount(
+                to_cents(form.get('early_payment_discount') or '0'),
+                [amounts[index] for index in eligible],
+                [shares[index][:2] for index in eligible],
+            )
+        bill.update({
+            'upper_discount': from_cents(upper_discount),
+            'lower_discount': from_cents(lower_discount),
+            'early_payment_date': form.get('early_payment_date'),
+        })
+
+    bill['text'] = generate_text(
+        service['text_name'],
+        total,
+        upper_amount,
+        lower_amount,
+        from_date,
+        to_date,
+        due_date,
+        bill['upper_discount'],
+        bill['lower_discount'],
+        bill['early_payment_date']
+    )
+    return bill
+
+# Función para construir la clave canónica de una factura (fechas como ordinales, montos en centavos)
+# Las fechas del período, de vencimiento y de pago anticipado aparecen tal cual en el texto,
+# por eso también forman parte de la clave.
+def bill_key(form):
+    from_date, to_date = _date_range(form)
+    service = get_service(_required(form, 'service_choice'))
+    amounts = [to_cents(_required(form, component['field'])) for component in service['components']]
+    if service['early_payment_discount']:
+        amounts.append(to_cents(form.get('early_payment_discount') or '0'))
+    return json.dumps([
+        service['id'],
+        amounts,
+        form_period(form),
+        from_date,
+        to_date,
+        form.get('due_date') or '',
+        form.get('early_payment_date') if service['early_payment_discount'] else None,
+    ])
+
+# Función para obtener el nombre del servicio de una factura
+def resolve_service_name(bill):
+    if bill.get('service_name'):
+        return bill['service_name']
+    return get_service(bill.get('service_choice', 0))['name']
+
+# Función para saber si la vacancia de una factura del lote se reparte entre las unidades
+# El monto del lote es un solo total, así que se usa la regla de los componentes por ocupación del servicio.
+def _redistributes_vacancy(bill):
+    if 'service_choice' not in bill:
+        return False
+    components = [component for component in get_service(bill['service_choice'])['components'] if component['split'] == 'occupancy']
+    return bool(components) and all(component['redistribute_vacancy'] for component in components)
+
+# Función para importar NumPy la primera vez que se necesita
+def _load_numpy():
+    if not _numpy:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy.append(numpy)
+    return _numpy[0]
+
+# Función para calcular los días habitados de todo el lote con NumPy
+def _occupied_days_numpy(np, columns):
+    from_dates, to_dates, upper_starts, lower_starts, upper_ends, lower_ends = (np.array(column, dtype=np.int64) for column in columns)
+    total_days = to_dates - from_dates + 1
+    upper_days = np.clip(np.minimum(to_dates, upper_ends) - np.maximum(from_dates, upper_starts) + 1, 0, None)
+    lower_days = np.clip(np.minimum(to_dates, lower_ends) - np.maximum(from_dates, lower_starts) + 1, 0, None)
+    return total_days.tolist(), upper_days.tolist(), lower_days.tolist()
+
+# Función para calcular los días habitados de todo el lote sin NumPy
+def _occupied_days_python(columns):
+    total_days, upper_days, lower_days = [], [], []
+    for from_date, to_date, upper_start, lower_start, upper_end, lower_end in zip(*columns):
+        total_days.append(to_date - from_date + 1)
+        upper_days.append(max(min(to_date, upper_end) - max(from_date, upper_start) + 1, 0))
+        lower_days.append(max(min(to_date, lower_end) - max(from_date, lower_start) + 1, 0))
+    return total_days, upper_days, lower_days
+
+# Función para calcular un lote de facturas en una sola pasada
+def calculate_batch(bills):
+    # Convertir todas las fechas a ordinales (las repetidas salen de la memoria de parse_ordinal)
+    # y los montos a centavos con la misma conversión exacta que el formulario
+    amounts = []
+    redistribute = []
+    due_dates = []
+    columns = ([], [], [], [], [], [])
+    for index, bill in enumerate(bills):
+        try:
+            consider_dates = bool(bill.get('consider_dates'))
+            consider_end_dates = bool(bill.get('consider_end_dates'))
+            date_format = resolve_format(bill.get('date_format'))
+            amount_cents = to_cents(bill['amount'])
+            due_date = bill.get('due_date', '')
+            if not isinstance(due_date, str):
+                raise ValueError(f"due_date must be a string, not {due_date!r}")
+            redistribute_vacancy = _redistributes_vacancy(bill)
+            from_date = parse_ordinal(bill['from_date'], date_format)
+            to_date = parse_ordinal(bill['to_date'], date_format)
+            if to_date < from_date:
+                raise ValueError(f"Period ends before it starts: {bill['from_date']} to {bill['to_date']}")
+            upper_start = bill.get('upper_unit_start_date') if consider_dates else None
+            lower_start = bill.get('lower_unit_start_date') if consider_dates else None
+            upper_end = bill.get('upper_unit_end_date') if consider_end_dates else None
+            lower_end = bill.get('lower_unit_end_date') if consider_end_dates else None
+            row = (
+                from_date,
+                to_date,
+                parse_ordinal(upper_start, date_format) if upper_start else from_date,
+                parse_ordinal(lower_start, date_format) if lower_start else from_date,
+                parse_ordinal(upper_end, date_format) if upper_end else to_date,
+                parse_ordinal(lower_end, date_format) if lower_end else to_date,
+            )
+        except KeyError as e:
+            raise ValueError(f"Bill {index}: missing field {e}") from e
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Bill {index}: {e}") from e
+        amounts.append(amount_cents)
+        redistribute.append(redistribute_vacancy)
+        due_dates.append(due_date)
+        for column, value in zip(columns, row):
+            column.append(value)
+
+    np = _load_numpy() if len(bills) >= NUMPY_MIN_BATCH else None
+    if np is not None:
+        total_days, upper_days, lower_days = _occupied_days_numpy(np, columns)
+    else:
+        total_days, upper_days, lower_days = _occupied_days_python(columns)
+
+    # Repartir en centavos: cada unidad pesa sus días habitados y el resto queda como vacancia
+    # (o se reparte entre las unidades ocupadas si el servicio lo indica)
+    weight_rows = [
+        occupancy_weights(total, (upper, lower), (1, 1), redistribute_vacancy)
+        for total, upper, lower, redistribute_vacancy in zip(total_days, upper_days, lower_days, redistribute)
+    ]
+    shares = allocate_batch(amounts, weight_rows, np)
+
+    results = []
+    for index, bill in enumerate(bills):
+        amount = from_cents(amounts[index])
+        upper_amount = from_cents(shares[index][0])
+        lower_amount = from_cents(shares[index][1])
+        try:
+            service_name = resolve_service_name(bill)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Bill {index}: {e}") from e
+        results.append({
+            "service_name": service_name,
+            "amount": amount,
+            "upper_amount": upper_amount,
+            "lower_amount": lower_amount,
+            "total_days": total_days[index],
+            "upper_days": upper_days[index],
+            "lower_days": lower_days[index],
+            "text": generate_text(service_name, amount, upper_amount, lower_amount, bill['from_date'], bill['to_date'], due_dates[index]),
+        })
+    return results
@@ -0,0 +1,230 @@
+import argparse
+import atexit
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Archivo de configuración de la propiedad por defecto
+config_file = os.environ.get('CONFIG_FILE', 'config.json')
+
+# Cada propiedad guarda sus unidades y fechas en su propio archivo (shard) dentro de este directorio
+properties_dir = os.environ.get('PROPERTIES_DIR', 'properties')
+
+# Cantidad máxima de shards en memoria (los menos usados se descargan)
+PROPERTY_CACHE_SIZE = int(os.environ.get('PROPERTY_CACHE_SIZE', 256))
+
+# Tiempo de espera para agrupar escrituras consecutivas (segundos)
+COALESCE_DELAY = 0.05
+
+PROPERTY_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+# Función para inicializar la configuración por defecto
+def initialize_config():
+    return {
+        "upper_unit_start_date": "01/02/2024",
+        "lower_unit_start_date": "14/02/2024"
+    }
+
+# Función para identificar la versión del archivo en disco sin leerlo
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+# Configuración guardada en un archivo: se relee solo si cambió en disco y las escrituras seguidas se agrupan
+class ConfigShard:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._config = None
+        self._pending = {}
+        self._timer = None
+
+    # Función para escribir el archivo de forma atómica (archivo temporal + rename)
+    def _write_file(self, config):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.config.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(config, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._stamp = _file_stamp(self.path)
+        self._config = config
+
+    # Función para leer el archivo solo si cambió desde la última lectura
+    def _read_file(self):
+        stamp = _file_stamp(self.path)
+        if stamp is not None and stamp == self._stamp:
+            return self._config
+        if stamp is None:
+            self._write_file(initialize_config())
+            return self._config
+        with open(self.path, 'r') as file:
+            try:
+                config = json.load(file)
+            except json.JSONDecodeError:
+                config = None
+        if config is None:
+            self._write_file(initialize_config())
+            return self._config
+        self._stamp = stamp
+        self._config = config
+        return config
+
+    def load(self):
+        with self._lock:
+            config = dict(self._read_file())
+            config.update(self._pending)
+        return config
+
+    def save(self, config):
+        with self._lock:
+            current = dict(self._read_file())
+            current.update(self._pending)
+            changes = {key: value for key, value in config.items() if current.get(key) != value}
+            if not changes:
+                return
+            self._pending.update(changes)
+            if self._timer is None:
+                self._timer = threading.Timer(COALESCE_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    # Función para escribir los cambios pendientes en disco
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            if not self._pending:
+                return
+            lock_file = None
+            if fcntl is not None:
+                lock_file = open(self.path + '.lock', 'w')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Aplicar solo las claves modificadas sobre la versión más reciente del disco
+                config = dict(self._read_file())
+                config.update(self._pending)
+                self._write_file(config)
+                self._pending.clear()
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+
+_default_shard = ConfigShard(config_file)
+_shards = OrderedDict()
+_shards_lock = threading.Lock()
+
+# Función para obtener la ruta del shard de una propiedad
+def property_path(property_id):
+    if not PROPERTY_ID.match(property_id or ''):
+        raise KeyError(property_id)
+    return os.path.join(properties_dir, property_id + '.json')
+
+# Función para saber si una propiedad existe (sin cargarla)
+def property_exists(property_id):
+    try:
+        return os.path.exists(property_path(property_id))
+    except KeyError:
+        return False
+
+# Función para obtener el shard de una propiedad, cargándolo la primera vez que se usa
+# Sin property_id se usa config.json. Una propiedad desconocida da KeyError.
+def get_shard(property_id=None):
+    if property_id is None:
+        return _default_shard
+    with _shards_lock:
+        shard = _shards.get(property_id)
+        if shard is not None:
+            _shards.move_to_end(property_id)
+            return shard
+    path = property_path(property_id)
+    if not os.path.exists(path):
+        raise KeyError(property_id)
+    evicted = []
+    with _shards_lock:
+        shard = _shards.setdefault(property_id, ConfigShard(path))
+        _shards.move_to_end(property_id)
+        while len(_shards) > PROPERTY_CACHE_SIZE:
+            evicted.append(_shards.popitem(last=False)[1])
+    for old in evicted:
+        old.flush()
+    return shard
+
+# Función para crear una propiedad con la configuración por defecto
+def create_property(property_id, config=None):
+    path = property_path(property_id)
+    os.makedirs(properties_dir, exist_ok=True)
+    if os.path.exists(path):
+        raise ValueError(f"Property {property_id} already exists")
+    shard = ConfigShard(path)
+    shard._write_file(dict(initialize_config(), **(config or {})))
+    return shard
+
+# Función para cargar o inicializar la configuración
+def load_config(property_id=None):
+    return get_shard(property_id).load()
+
+# Función para guardar la configuración (las escrituras seguidas se agrupan)
+def save_config(config, property_id=None):
+    get_shard(property_id).save(config)
+
+# Función para escribir en disco los cambios pendientes de todas las propiedades en memoria
+def flush_config():
+    with _shards_lock:
+        shards = list(_shards.values())
+    _default_shard.flush()
+    for shard in shards:
+        shard.flush()
+
+atexit.register(flush_config)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m config_store', description='Manage per-property configuration shards.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    create = subparsers.add_parser('create', help='create a property with the default configuration')
+    create.add_argument('property_id')
+    create.add_argument('--upper-unit-start-date')
+    create.add_argument('--lower-unit-start-date')
+    subparsers.add_parser('list', help='list the properties')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        if os.path.isdir(properties_dir):
+            for name in sorted(os.listdir(properties_dir)):
+                if name.endswith('.json') and PROPERTY_ID.match(name[:-5]):
+                    print(name[:-5])
+        return 0
+
+    config = {}
+    if args.upper_unit_start_date:
+        config['upper_unit_start_date'] = args.upper_unit_start_date
+    if args.lower_unit_start_date:
+        config['lower_unit_start_date'] = args.lower_unit_start_date
+    try:
+        create_property(args.property_id, config)
+    except KeyError:
+        parser.error(f"Invalid property id {args.property_id!r}")
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import os
+from datetime import date, datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# Manejo de fechas: parser de formato fijo sin strptime ni excepciones de respaldo.
+# El formato es explícito ('dmy', 'mdy' o 'iso'); no se adivina entre día y mes.
+
+# Formatos soportados: separador y posición de (día, mes, año)
+DATE_FORMATS = {
+    'dmy': ('/', (0, 1, 2), 'DD/MM/YYYY'),
+    'mdy': ('/', (1, 0, 2), 'MM/DD/YYYY'),
+    'iso': ('-', (2, 1, 0), 'YYYY-MM-DD'),
+}
+DEFAULT_DATE_FORMAT = os.environ.get('DATE_FORMAT', 'dmy')
+
+# Período de facturación con todas las fechas ya convertidas a ordinales.
+# Un inicio o fin de unidad en None significa que la unidad ocupa el período desde el inicio o hasta el final.
+class Period(NamedTuple):
+    start: int
+    end: int
+    upper_start: Optional[int] = None
+    upper_end: Optional[int] = None
+    lower_start: Optional[int] = None
+    lower_end: Optional[int] = None
+
+    @property
+    def total_days(self):
+        return self.end - self.start + 1
+
+# Función para validar el nombre del formato
+def resolve_format(date_format):
+    date_format = date_format or DEFAULT_DATE_FORMAT
+    if date_format not in DATE_FORMATS:
+        raise ValueError(f"Unknown date format {date_format!r}; expected one of {', '.join(DATE_FORMATS)}")
+    return date_format
+
+# Función para convertir una fecha a ordinal (con memoria de las fechas ya vistas)
+@lru_cache(maxsize=4096)
+def parse_ordinal(date_string, date_format=None):
+    separator, (day_index, month_index, year_index), pattern = DATE_FORMATS[resolve_format(date_format)]
+    parts = date_string.strip().split(separator) if isinstance(date_string, str) else ()
+    if (
+        len(parts) != 3
+        or not all(part.isascii() and part.isdigit() for part in parts)
+        or len(parts[year_index]) != 4
+        or len(parts[day_index]) > 2
+        or len(parts[month_index]) > 2
+    ):
+        raise ValueError(f"Date {date_string} does not match format {pattern}")
+    try:
+        return date(int(parts[year_index]), int(parts[month_index]), int(parts[day_index])).toordinal()
+    except ValueError:
+        raise ValueError(f"Date {date_string} is not a valid {pattern} date") from None
+
+# Función para convertir una fecha de texto a datetime
+def parse_date(date_string, date_format=None):
+    return datetime.fromordinal(parse_ordinal(date_string, date_format))
+
+# Función para convertir una fecha a ordinal si está presente
+def optional_ordinal(date_string, date_format=None):
+    return parse_ordinal(date_string, date_format) if date_string else None
+
+# Función para construir el período y las ocupaciones de las unidades de una sola vez
+def make_period(from_date, to_date, upper_start=None, lower_start=None, upper_end=None, lower_end=None, date_format=None):
+    start = parse_ordinal(from_date, date_format)
+    end = parse_ordinal(to_date, date_format)
+    if end < start:
+        raise ValueError(f"Period ends before it starts: {from_date} to {to_date}")
+    return Period(
+        start,
+        end,
+        optional_ordinal(upper_start, date_format),
+        optional_ordinal(upper_end, date_format),
+        optional_ordinal(lower_start, date_format),
+        optional_ordinal(lower_end, date_format),
+    )
@@ -0,0 +1,221 @@
+import argparse
+import csv
+import io
+import sys
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+
+import ledger
+from allocation import format_cents, from_cents
+from billing import generate_text
+from config_store import property_exists
+
+# Exportación de estados de cuenta desde el ledger, en streaming y con memoria constante.
+# Uso: python -m export {csv,xlsx,zip} [-o archivo] [--property id] [--unit lower] [--service ...] [--start 2024-01-01] [--end 2024-12-31]
+
+CHUNK_SIZE = 64 * 1024
+CHARGE_COLUMNS = ['charge_id', 'bill_id', 'unit', 'service', 'period_start', 'period_end', 'due_date', 'amount', 'discount', 'paid_at', 'bill_total']
+UNITS = ('upper', 'lower')
+
+# Función para convertir un cargo del ledger en una fila de exportación
+def charge_row(charge):
+    return [
+        charge['id'],
+        charge['bill_id'],
+        charge['unit'],
+        charge['service'],
+        charge['period_start'],
+        charge['period_end'],
+        charge['due_date'] or '',
+        format_cents(charge['amount_cents']),
+        format_cents(charge['discount_cents']),
+        charge['paid_at'] or '',
+        format_cents(charge['total_cents']),
+    ]
+
+# Función para generar el CSV de cargos por bloques
+def stream_csv(filters):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CHARGE_COLUMNS)
+    for charge in ledger.query_charges(**filters):
+        writer.writerow(charge_row(charge))
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+# Destino de escritura sin seek: zipfile escribe descriptores de datos y el generador vacía el buffer
+class _ZipSink:
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+# Partes fijas de un libro XLSX con una sola hoja
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Charges" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+NUMERIC_COLUMNS = {'charge_id', 'bill_id', 'amount', 'discount', 'bill_total'}
+
+def _xlsx_row(values):
+    cells = []
+    for column, value in zip(CHARGE_COLUMNS, values):
+        if column in NUMERIC_COLUMNS and value != '':
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            cells.append(f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+# Función para generar el XLSX de cargos por bloques
+def stream_xlsx(filters):
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            header = '<row>' + ''.join(f'<c t="inlineStr"><is><t>{column}</t></is></c>' for column in CHARGE_COLUMNS) + '</row>'
+            sheet.write(header.encode('utf-8'))
+            for charge in ledger.query_charges(**filters):
+                sheet.write(_xlsx_row(charge_row(charge)).encode('utf-8'))
+                if sink.size >= CHUNK_SIZE:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+# Función para obtener el texto de un estado de cuenta (el guardado o regenerado desde los montos)
+def statement_text(bill):
+    if bill['text']:
+        return bill['text']
+    upper_discount = bill['upper_discount_cents']
+    lower_discount = bill['lower_discount_cents']
+    has_discount = bool(upper_discount or lower_discount)
+    return generate_text(
+        bill['service'],
+        from_cents(bill['total_cents']),
+        from_cents(bill['upper_cents'] or 0),
+        from_cents(bill['lower_cents'] or 0),
+        _display_date(bill['period_start']),
+        _display_date(bill['period_end']),
+        _display_date(bill['due_date']),
+        from_cents(upper_discount or 0) if has_discount else None,
+        from_cents(lower_discount or 0) if has_discount else None,
+        _display_date(bill['early_payment_date']) or None,
+        late_amount=from_cents(bill['late_amount_cents']) if bill['late_amount_cents'] else None,
+    )
+
+def _display_date(iso_date):
+    return date.fromisoformat(iso_date).strftime('%d/%m/%Y') if iso_date else ''
+
+# Función para generar un ZIP con un archivo de estados de cuenta por unidad
+def stream_statements_zip(filters):
+    sink = _ZipSink()
+    units = [filters['unit']] if filters.get('unit') else list(UNITS)
+    bill_filters = {key: value for key, value in filters.items() if key != 'unit'}
+    separator = '\n\n' + '-' * 40 + '\n\n'
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for unit in units:
+            with archive.open(f'statements/{unit}.txt', 'w', force_zip64=True) as entry:
+                first = True
+                for bill in ledger.query_bills(unit=unit, **bill_filters):
+                    if not first:
+                        entry.write(separator.encode('utf-8'))
+                    entry.write(statement_text(bill).encode('utf-8'))
+                    first = False
+                    if sink.size >= CHUNK_SIZE:
+                        yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+EXPORTS = {
+    'csv': (stream_csv, 'text/csv', 'charges.csv'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'charges.xlsx'),
+    'zip': (stream_statements_zip, 'application/zip', 'statements.zip'),
+}
+
+# Función para leer los filtros (unidad, servicio y rango de fechas en ISO o en date_format)
+# La propiedad no se lee de values: la fija la ruta o la opción --property.
+def export_filters(values, property_id=None):
+    filters = {'property_id': property_id}
+    for key in ('unit', 'service', 'start', 'end'):
+        value = values.get(key)
+        if value:
+            filters[key] = ledger.to_iso(value, values.get('date_format')) if key in ('start', 'end') else value
+    return filters
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m export', description='Export bill history from the ledger.')
+    parser.add_argument('format', choices=sorted(EXPORTS))
+    parser.add_argument('-o', '--output', default='-', help="output file ('-' for stdout)")
+    parser.add_argument('--property', help='property id (the default property when omitted)')
+    parser.add_argument('--unit')
+    parser.add_argument('--service')
+    parser.add_argument('--start', help='first billing period start date to include')
+    parser.add_argument('--end', help='last billing period start date to include')
+    parser.add_argument('--date-format', help='date format of --start and --end when not ISO (dmy, mdy or iso)')
+    args = parser.parse_args(argv)
+
+    stream, _, _ = EXPORTS[args.format]
+    if args.property and not property_exists(args.property):
+        parser.error(f"Unknown property {args.property!r}")
+    try:
+        filters = export_filters(vars(args), args.property)
+    except ValueError as e:
+        parser.error(str(e))
+    target = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for chunk in stream(filters):
+            target.write(chunk)
+    finally:
+        if target is not sys.stdout.buffer:
+            target.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import argparse
+import csv
+import hashlib
+import json
+import re
+import sys
+import xml.etree.ElementTree as ElementTree
+from datetime import date
+
+import ledger
+from allocation import format_cents, to_cents
+from batch import chunked
+from dates import parse_ordinal, resolve_format
+from services import get_service
+
+# Importador de exportaciones de las distribuidoras (Green Button ESPI XML o CSV).
+# Lee en streaming y escribe una solicitud JSONL por período, lista para python -m batch.
+# Uso: python -m importer archivo.xml --service 1 [-o salida.jsonl] [--format espi|csv] [--date-format iso]
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+ESPI = '{http://naesb.org/espi}'
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+USAGE_POINT = re.compile(r'/UsagePoint/([^/]+)')
+CHUNK_SIZE = 1000
+
+# Encabezados aceptados en los CSV de las distribuidoras
+CSV_COLUMNS = {
+    'account': ('account', 'account_number', 'account_id', 'account_no'),
+    'from_date': ('from_date', 'start_date', 'period_start', 'billing_period_start', 'start'),
+    'to_date': ('to_date', 'end_date', 'period_end', 'billing_period_end', 'end'),
+    'amount': ('amount', 'amount_due', 'bill_amount', 'total_amount', 'total'),
+    'due_date': ('due_date', 'payment_due_date'),
+}
+
+# Función para convertir segundos Unix (ya en hora local) a fecha ISO
+def _epoch_date(seconds):
+    return date.fromordinal(EPOCH_ORDINAL + seconds // 86400).isoformat()
+
+# Función para leer los períodos de facturación de un archivo Green Button (ESPI)
+# Cada UsageSummary trae billingPeriod (inicio y duración en segundos) y billLastPeriod
+# (en cien milésimas de la moneda). Los elementos ya procesados se liberan para mantener la memoria constante.
+def read_espi(source, account=None):
+    tz_offset = 0
+    current_account = account
+    root = None
+    for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            continue
+        tag = element.tag
+        if tag == ATOM + 'link' and account is None:
+            match = USAGE_POINT.search(element.get('href', ''))
+            if match:
+                current_account = match.group(1)
+        elif tag == ESPI + 'LocalTimeParameters':
+            tz_offset = int(element.findtext(ESPI + 'tzOffset') or 0)
+        elif tag == ESPI + 'UsageSummary':
+            start = element.findtext(f'{ESPI}billingPeriod/{ESPI}start')
+            duration = element.findtext(f'{ESPI}billingPeriod/{ESPI}duration')
+            bill = element.findtext(ESPI + 'billLastPeriod')
+            if start is None or duration is None or bill is None:
+                yield None, "UsageSummary without billingPeriod or billLastPeriod"
+            else:
+                start = int(start) + tz_offset
+                amount_cents = (int(bill) + 500) // 1000
+                yield {
+                    'account': current_account or '',
+                    'from_date': _epoch_date(start),
+                    'to_date': _epoch_date(start + int(duration) - 1),
+                    'amount_cents': amount_cents,
+                }, None
+        elif tag == ATOM + 'entry' and root is not None:
+            current_account = account
+            root.clear()
+
+# Función para leer los períodos de facturación de un CSV de estados de cuenta
+def read_statement_csv(source, account=None, date_format=None):
+    date_format = resolve_format(date_format)
+    reader = csv.reader(source)
+    header = next(reader, None)
+    if header is None:
+        return
+    names = [re.sub(r'[\s\-]+', '_', name.strip().lower()) for name in header]
+    positions = {}
+    for column, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                positions[column] = names.index(alias)
+                break
+    missing = [column for column in ('from_date', 'to_date', 'amount') if column not in positions]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+
+    def iso(value):
+        return date.fromordinal(parse_ordinal(value.strip(), date_format)).isoformat()
+
+    for line_number, row in enumerate(reader, 2):
+        if not any(row):
+            continue
+        try:
+            record = {
+                'account': account or (row[positions['account']].strip() if 'account' in positions else ''),
+                'from_date': iso(row[positions['from_date']]),
+                'to_date': iso(row[positions['to_date']]),
+                'amount_cents': to_cents(row[positions['amount']].strip().replace('$', '').replace(',', '')),
+            }
+            if 'due_date' in positions and row[positions['due_date']].strip():
+                record['due_date'] = iso(row[positions['due_date']])
+        except (IndexError, TypeError, ValueError) as e:
+            yield None, f"Line {line_number}: {e}"
+            continue
+        yield record, None
+
+# Función para calcular la clave de deduplicación de un período
+def import_key(service_name, record):
+    raw = f"{service_name}|{record['account']}|{record['from_date']}|{record['to_date']}|{record['amount_cents']}"
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).digest()
+
+# Función para convertir un período importado en una solicitud para calculate_batch
+def bill_request(service_id, record):
+    bill = {
+        'service_choice': service_id,
+        'account': record['account'],
+        'amount': format_cents(record['amount_cents']),
+        'from_date': record['from_date'],
+        'to_date': record['to_date'],
+        'date_format': 'iso',
+    }
+    if record.get('due_date'):
+        bill['due_date'] = record['due_date']
+    return bill
+
+# Función para importar períodos saltando los ya importados (devuelve solicitudes, duplicados y errores)
+# Los duplicados se detectan dentro del archivo con un set de hashes y contra el ledger con la tabla imports.
+def import_periods(records, service_id, record=True):
+    service_name = get_service(service_id)['name']
+    seen = set()
+    counts = {'imported': 0, 'duplicates': 0, 'errors': []}
+    for chunk in chunked(records, CHUNK_SIZE):
+        fresh = []
+        for parsed, error in chunk:
+            if error:
+                counts['errors'].append(error)
+                continue
+            key = import_key(service_name, parsed)
+            if key in seen:
+                counts['duplicates'] += 1
+                continue
+            seen.add(key)
+            fresh.append((key, parsed))
+        known = ledger.known_imports(key for key, _ in fresh)
+        rows = []
+        for key, parsed in fresh:
+            if key in known:
+                counts['duplicates'] += 1
+                continue
+            rows.append((key, service_name, parsed['account'], parsed['from_date'], parsed['to_date'], parsed['amount_cents']))
+            counts['imported'] += 1
+            yield bill_request(service_id, parsed)
+        if record and rows:
+            ledger.record_imports(rows)
+    return counts
+
+# Función para detectar el formato por la extensión o el primer carácter
+def detect_format(path, source):
+    if path.lower().endswith('.csv'):
+        return 'csv'
+    if path.lower().endswith('.xml'):
+        return 'espi'
+    return 'espi' if source.peek(1)[:1] == b'<' else 'csv'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m importer', description='Import billing periods from Green Button XML or CSV utility exports.')
+    parser.add_argument('input', help='Green Button (ESPI) XML or CSV statement file')
+    parser.add_argument('--service', type=int, required=True, help='service id from services.json')
+    parser.add_argument('--format', choices=['espi', 'csv'], help='input format (detected from the file when omitted)')
+    parser.add_argument('--account', help='account to use for every period (overrides the file)')
+    parser.add_argument('--date-format', help='date format of CSV dates (dmy, mdy or iso)')
+    parser.add_argument('-o', '--output', default='-', help="JSONL file for the bill requests ('-' for stdout)")
+    parser.add_argument('--dry-run', action='store_true', help='do not remember the imported periods')
+    args = parser.parse_args(argv)
+
+    try:
+        get_service(args.service)
+        resolve_format(args.date_format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    source = open(args.input, 'rb')
+    input_format = args.format or detect_format(args.input, source)
+    if input_format == 'csv':
+        text = open(args.input, 'r', encoding='utf-8-sig', newline='')
+        source.close()
+        source = text
+        records = read_statement_csv(source, args.account, args.date_format)
+    else:
+        records = read_espi(source, args.account)
+
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    requests = import_periods(records, args.service, record=not args.dry_run)
+    try:
+        while True:
+            target.write(json.dumps(next(requests)) + '\n')
+    except StopIteration as stop:
+        counts = stop.value
+    except (ValueError, ElementTree.ParseError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    for error in counts['errors']:
+        print(error, file=sys.stderr)
+    print(f"Imported {counts['imported']} periods, skipped {counts['duplicates']} duplicates, {len(counts['errors'])} errors", file=sys.stderr)
+    return 1 if counts['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+
+from allocation import to_cents
+from dates import parse_ordinal
+
+# Base de datos del ledger y archivo JSON heredado
+ledger_db = os.environ.get('LEDGER_DB', 'ledger.db')
+legacy_ledger_file = os.environ.get('LEGACY_LEDGER_FILE', 'ledger.json')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS bills (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    service TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    period_start TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    due_date TEXT,
+    early_payment_date TEXT,
+    late_amount_cents INTEGER,
+    text TEXT,
+    bill_key TEXT,
+    property_id TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS charges (
+    id INTEGER PRIMARY KEY,
+    bill_id INTEGER NOT NULL REFERENCES bills(id),
+    unit TEXT NOT NULL,
+    service TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    discount_cents INTEGER NOT NULL DEFAULT 0,
+    paid_at TEXT,
+    property_id TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS charges_unit_period ON charges(unit, period_start);
+CREATE INDEX IF NOT EXISTS charges_service_period ON charges(service, period_start);
+CREATE INDEX IF NOT EXISTS charges_period ON charges(period_start);
+CREATE INDEX IF NOT EXISTS charges_outstanding ON charges(unit) WHERE paid_at IS NULL;
+CREATE INDEX IF NOT EXISTS charges_bill ON charges(bill_id);
+CREATE INDEX IF NOT EXISTS bills_service_period ON bills(service, period_start);
+CREATE INDEX IF NOT EXISTS bills_period ON bills(period_start);
+CREATE TABLE IF NOT EXISTS imports (
+    key BLOB PRIMARY KEY,
+    service TEXT NOT NULL,
+    account TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    imported_at TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+# Columnas agregadas después de la primera versión del esquema y los índices que las usan
+# (las bases ya creadas se actualizan al abrir la conexión)
+# Cada propiedad tiene su propio ledger dentro de la base: property_id '' es la propiedad por defecto.
+ADDED_COLUMNS = [
+    ('bills', 'bill_key', 'TEXT'),
+    ('bills', 'property_id', "TEXT NOT NULL DEFAULT ''"),
+    ('charges', 'property_id', "TEXT NOT NULL DEFAULT ''"),
+]
+ADDED_INDEXES = [
+    # La clave de factura es única dentro de cada propiedad (reemplaza al índice global anterior)
+    'DROP INDEX IF EXISTS bills_key',
+    'CREATE UNIQUE INDEX IF NOT EXISTS bills_property_key ON bills(property_id, bill_key)',
+    'CREATE INDEX IF NOT EXISTS bills_property_period ON bills(property_id, period_start)',
+    'CREATE INDEX IF NOT EXISTS charges_property_period ON charges(property_id, period_start)',
+]
+
+_local = threading.local()
+
+# Función para normalizar una fecha a formato ISO (AAAA-MM-DD)
+# Las fechas que no son ISO se leen con date_format, el mismo formato con el que se calculó la factura.
+def to_iso(value, date_format=None):
+    if not value:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        return date.fromordinal(parse_ordinal(value, date_format)).isoformat()
+
+# Función para normalizar una fecha opcional del texto de la factura (vencimiento, pago anticipado)
+# El formulario acepta texto libre en estas fechas; si no es una fecha se guarda NULL y el texto queda en la factura.
+def optional_iso(value, date_format=None):
+    try:
+        return to_iso(value, date_format)
+    except (TypeError, ValueError):
+        return None
+
+# Función para obtener la conexión del hilo actual (una por hilo y por proceso)
+def get_connection():
+    connection = getattr(_local, 'connection', None)
+    if connection is not None and _local.pid == os.getpid():
+        return connection
+    connection = sqlite3.connect(ledger_db, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    upgrade_schema(connection)
+    _local.connection = connection
+    _local.pid = os.getpid()
+    migrate_legacy_ledger(connection)
+    return connection
+
+# Función para agregar las columnas e índices nuevos a una base existente
+def upgrade_schema(connection):
+    with connection:
+        connection.execute('BEGIN IMMEDIATE')
+        for table, column, definition in ADDED_COLUMNS:
+            columns = {row['name'] for row in connection.execute(f'PRAGMA table_info({table})')}
+            if column not in columns:
+                connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        for statement in ADDED_INDEXES:
+            connection.execute(statement)
+
+# Función para leer el ledger.json heredado (codificado en UTF-16)
+def read_legacy_ledger(path):
+    with open(path, 'rb') as file:
+        raw = file.read()
+    if raw.startswith((b'\xff\xfe', b'\xfe\xff')):
+        content = raw.decode('utf-16')
+    else:
+        content = raw.decode('utf-8-sig')
+    return json.loads(content) if content.strip() else []
+
+# Función para migrar una sola vez las entradas del ledger.json heredado
+# La comprobación se hace dentro de una transacción de escritura, así dos procesos no migran a la vez.
+def migrate_legacy_ledger(connection):
+    with connection:
+        connection.execute('BEGIN IMMEDIATE')
+        if connection.execute("SELECT 1 FROM meta WHERE key = 'legacy_ledger_migrated'").fetchone():
+            return
+        entries = read_legacy_ledger(legacy_ledger_file) if os.path.exists(legacy_ledger_file) else []
+        for entry in entries:
+            charges = {}
+            for unit in ('upper', 'lower'):
+                if f'{unit}_amount' in entry:
+                    charges[unit] = entry[f'{unit}_amount']
+            _insert_bill(
+                connection,
+                entry.get('service', ''),
+                entry.get('amount', sum(charges.values())),
+                entry['from_date'],
+                entry['to_date'],
+                entry.get('due_date'),
+                charges,
+                text=entry.get('text'),
+                created_at=entry.get('created_at'),
+            )
+        connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_ledger_migrated', ?)", (str(len(entries)),))
+
+# Con key (la clave canónica de billing.bill_key) la misma factura se guarda una sola vez:
+# un reenvío del formulario devuelve el id de la factura ya registrada.
+def _insert_bill(connection, service, total, from_date, to_date, due_date, charges, discounts=None, early_payment_date=None, late_amount=None, text=None, created_at=None, date_format=None, key=None, property_id=None):
+    property_id = property_id or ''
+    period_start = to_iso(from_date, date_format)
+    period_end = to_iso(to_date, date_format)
+    cursor = connection.execute(
+        'INSERT INTO bills (created_at, service, total_cents, period_start, period_end, due_date, early_payment_date, late_amount_cents, text, bill_key, property_id) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (property_id, bill_key) DO NOTHING',
+        (
+            created_at or datetime.now().isoformat(timespec='seconds'),
+            service,
+            to_cents(total),
+            period_start,
+            period_end,
+            optional_iso(due_date, date_format),
+            optional_iso(early_payment_date, date_format),
+            to_cents(late_amount) if late_amount else None,
+            text,
+            key,
+            property_id,
+        ),
+    )
+    if not cursor.rowcount:
+        return connection.execute('SELECT id FROM bills WHERE property_id = ? AND bill_key = ?', (property_id, key)).fetchone()['id']
+    bill_id = cursor.lastrowid
+    discounts = discounts or {}
+    connection.executemany(
+        'INSERT INTO charges (bill_id, unit, service, period_start, period_end, amount_cents, discount_cents, property_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [
+            (bill_id, unit, service, period_start, period_end, to_cents(amount), to_cents(discounts.get(unit, 0)), property_id)
+            for unit, amount in charges.items()
+        ],
+    )
+    return bill_id
+
+# Función para registrar una factura generada y sus cargos por unidad
+def record_bill(service, total, from_date, to_date, due_date, charges, discounts=None, early_payment_date=None, late_amount=None, text=None, date_format=None, key=None, property_id=None):
+    connection = get_connection()
+    with connection:
+        return _insert_bill(connection, service, total, from_date, to_date, due_date, charges, discounts, early_payment_date, late_amount, text, date_format=date_format, key=key, property_id=property_id)
+
+# Función para consultar cargos de una propiedad por unidad, servicio y período (devuelve un generador)
+def query_charges(unit=None, service=None, start=None, end=None, outstanding=None, property_id=None):
+    conditions = ['c.property_id = ?']
+    params = [property_id or '']
+    if unit:
+        conditions.append('c.unit = ?')
+        params.append(unit)
+    if service:
+        conditions.append('c.service = ?')
+        params.append(service)
+    if start:
+        conditions.append('c.period_start >= ?')
+        params.append(to_iso(start))
+    if end:
+        conditions.append('c.period_start <= ?')
+        params.append(to_iso(end))
+    if outstanding is True:
+        conditions.append('c.paid_at IS NULL')
+    elif outstanding is False:
+        conditions.append('c.paid_at IS NOT NULL')
+    sql = (
+        'SELECT c.id, c.bill_id, c.unit, c.service, c.period_start, c.period_end, c.amount_cents, c.discount_cents, c.paid_at, '
+        'b.total_cents, b.due_date, b.early_payment_date, b.late_amount_cents, b.created_at '
+        'FROM charges c JOIN bills b ON b.id = c.bill_id'
+    )
+    sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY c.period_start, c.id'
+    for row in get_connection().execute(sql, params):
+        yield dict(row)
+
+# Función para consultar facturas de una propiedad con los montos de ambas unidades (devuelve un generador)
+# Con unit solo se incluyen las facturas que tienen un cargo para esa unidad.
+def query_bills(unit=None, service=None, start=None, end=None, property_id=None):
+    conditions = ['b.property_id = ?']
+    params = [property_id or '']
+    if unit:
+        conditions.append('b.id IN (SELECT bill_id FROM charges WHERE unit = ?)')
+        params.append(unit)
+    if service:
+        conditions.append('b.service = ?')
+        params.append(service)
+    if start:
+        conditions.append('b.period_start >= ?')
+        params.append(to_iso(start))
+    if end:
+        conditions.append('b.period_start <= ?')
+        params.append(to_iso(end))
+    sql = (
+        'SELECT b.id, b.created_at, b.service, b.total_cents, b.period_start, b.period_end, b.due_date, '
+        'b.early_payment_date, b.late_amount_cents, b.text, '
+        "SUM(CASE WHEN c.unit = 'upper' THEN c.amount_cents END) AS upper_cents, "
+        "SUM(CASE WHEN c.unit = 'lower' THEN c.amount_cents END) AS lower_cents, "
+        "SUM(CASE WHEN c.unit = 'upper' THEN c.discount_cents END) AS upper_discount_cents, "
+        "SUM(CASE WHEN c.unit = 'lower' THEN c.discount_cents END) AS lower_discount_cents "
+        'FROM bills b JOIN charges c ON c.bill_id = b.id'
+    )
+    sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' GROUP BY b.id ORDER BY b.period_start, b.id'
+    for row in get_connection().execute(sql, params):
+        yield dict(row)
+
+# Función para obtener el total pendiente de pago por unidad de una propiedad
+def outstanding_by_unit(property_id=None):
+    rows = get_connection().execute(
+        'SELECT unit, SUM(amount_cents) AS cents FROM charges WHERE paid_at IS NULL AND property_id = ? GROUP BY unit ORDER BY unit',
+        (property_id or '',),
+    )
+    return {row['unit']: row['cents'] / 100 for row in rows}
+
+# Función para marcar cargos como pagados
+def mark_paid(charge_ids, paid_at=None):
+    paid_at = to_iso(paid_at) or date.today().isoformat()
+    connection = get_connection()
+    with connection:
+        connection.executemany('UPDATE charges SET paid_at = ? WHERE id = ?', [(paid_at, charge_id) for charge_id in charge_ids])
+
+# Función para saber cuáles períodos importados ya están en el ledger (por hash de cuenta, período y monto)
+def known_imports(keys):
+    keys = list(keys)
+    connection = get_connection()
+    known = set()
+    for offset in range(0, len(keys), 500):
+        batch = keys[offset:offset + 500]
+        placeholders = ', '.join('?' * len(batch))
+        known.update(row[0] for row in connection.execute(f'SELECT key FROM imports WHERE key IN ({placeholders})', batch))
+    return known
+
+# Función para registrar períodos importados
+def record_imports(rows):
+    imported_at = datetime.now().isoformat(timespec='seconds')
+    connection = get_connection()
+    with connection:
+        connection.executemany(
+            'INSERT OR IGNORE INTO imports (key, service, account, period_start, period_end, amount_cents, imported_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [row + (imported_at,) for row in rows],
+        )
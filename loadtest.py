@@ -0,0 +1,78 @@
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+# Prueba de carga simple con conexiones keep-alive.
+# Ejemplo:
+#   python app.py --dev &                      (servidor de desarrollo)
+#   python -m serve --workers 4 &              (servidor de producción)
+#   python loadtest.py http://127.0.0.1:5000/ --concurrency 16 --duration 10
+
+POST_FORM = {
+    'service_choice': '1',
+    'amount': '123.45',
+    'date_range': '01/02/2024 to 29/02/2024',
+    'due_date': '10/03/2024',
+}
+
+# Función que ejecuta solicitudes en un hilo hasta que se acaba el tiempo
+def worker(url, method, deadline, latencies, errors, reconnects):
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    body = urlencode(POST_FORM) if method == 'POST' else None
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            connection.request(method, parts.path or '/', body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except http.client.RemoteDisconnected:
+            # El servidor cerró una conexión keep-alive reutilizada; se reconecta como haría un cliente real
+            reconnects.append(1)
+            connection.close()
+            continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure throughput and latency of the billing generator.')
+    parser.add_argument('url', nargs='?', default='http://127.0.0.1:5000/')
+    parser.add_argument('--method', choices=['GET', 'POST'], default='GET')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    latencies = []
+    errors = []
+    reconnects = []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args.url, args.method, deadline, latencies, errors, reconnects))
+        for _ in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    count = len(latencies)
+    print(f"{args.method} {args.url}  concurrency={args.concurrency}")
+    print(f"requests: {count}  errors: {len(errors)}  reconnects: {len(reconnects)}  throughput: {count / elapsed:.1f} req/s")
+    if count:
+        for label, quantile in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99)):
+            print(f"{label}: {latencies[min(int(count * quantile), count - 1)] * 1000:.2f} ms")
+
+if __name__ == '__main__':
+    main()
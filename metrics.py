@@ -0,0 +1,337 @@
+import cProfile
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Instrumentación por solicitud: tiempos por fase (Server-Timing), histogramas y contadores
+# en formato de texto de Prometheus, y volcado opcional de cProfile para las solicitudes lentas.
+# Con METRICS_ENABLED=0 los temporizadores son un objeto vacío compartido.
+# Con varios procesos (gunicorn) cada worker vuelca sus métricas a METRICS_DIR como mucho una vez
+# por segundo y /metrics suma los archivos de todos los workers; los workers que terminan pasan sus
+# totales a archive.json. Las fuentes adicionales (register_collector) son del worker que responde.
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') not in ('0', 'false', 'off')
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '0'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_KEEP = 10
+DUMP_INTERVAL = 1.0
+HTTP_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+# Límites de los buckets de los histogramas (segundos)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_collectors = []
+_slowest = []
+_shared = {'dir': os.environ.get('METRICS_DIR'), 'last_dump': 0.0}
+# Solo se perfila una solicitud a la vez: desde Python 3.12 no puede haber dos cProfile activos
+_profile_lock = threading.Lock()
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class _PhaseTimer:
+    __slots__ = ('phase', 'start')
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        phases = getattr(_local, 'phases', None)
+        if phases is not None:
+            phases[self.phase] = phases.get(self.phase, 0.0) + time.perf_counter() - self.start
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+# Función para medir una fase de la solicitud actual
+def timed(phase):
+    if not METRICS_ENABLED:
+        return _NULL_TIMER
+    return _PhaseTimer(phase)
+
+# Función para etiquetar la solicitud actual (por ejemplo, el tipo de servicio)
+def set_label(name, value):
+    labels = getattr(_local, 'labels', None)
+    if labels is not None:
+        labels[name] = str(value)
+
+# Función para empezar de cero (un proceso hijo no debe volver a contar lo del padre)
+def _reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+    _shared['last_dump'] = 0.0
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset)
+
+# Función para activar la suma de métricas entre procesos (llamar antes de crear los workers)
+def set_metrics_dir(directory):
+    os.makedirs(directory, exist_ok=True)
+    _shared['dir'] = directory
+
+# Función para reconocer los archivos de métricas (el directorio puede contener otros archivos)
+def _is_dump(name):
+    return name == 'archive.json' or (name.startswith('worker-') and name.endswith('.json'))
+
+# Función para borrar los volcados de una ejecución anterior sin tocar el resto del directorio
+def clear_metrics_dir(directory):
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if _is_dump(name) or name == 'archive.json.lock' or (name.startswith('.metrics.') and name.endswith('.tmp')):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+# Función para registrar una fuente de métricas adicional (devuelve líneas en formato Prometheus)
+def register_collector(collector):
+    _collectors.append(collector)
+
+def _key(name, labels):
+    return (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+
+def observe(name, labels, seconds):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[0][index] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+def increment(name, labels, amount=1):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+# Función para escapar un valor de etiqueta según el formato de texto de Prometheus
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + '}'
+
+# Función para copiar las métricas de este proceso
+def _snapshot():
+    with _lock:
+        return {
+            'histograms': [[name, labels, buckets[:], total, count] for (name, labels), (buckets, total, count) in _histograms.items()],
+            'counters': [[name, labels, value] for (name, labels), value in _counters.items()],
+        }
+
+# Función para sumar un volcado a los totales
+def _merge(histograms, counters, data):
+    for name, labels, buckets, total, count in data['histograms']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        histogram = histograms.setdefault(key, [[0] * len(BUCKETS), 0.0, 0])
+        histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+        histogram[1] += total
+        histogram[2] += count
+    for name, labels, value in data['counters']:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        counters[key] = counters.get(key, 0) + value
+
+def _read_dump(path):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _write_dump(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.metrics.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(data, file)
+    os.replace(temp_path, path)
+
+def _worker_path():
+    return os.path.join(_shared['dir'], f'worker-{os.getpid()}.json')
+
+# Función para volcar las métricas de este worker al directorio compartido
+def dump_metrics():
+    if _shared['dir']:
+        _shared['last_dump'] = time.monotonic()
+        _write_dump(_worker_path(), _snapshot())
+
+# Función para pasar los totales de un worker que termina al archivo acumulado
+def retire_worker():
+    if not _shared['dir']:
+        return
+    archive = os.path.join(_shared['dir'], 'archive.json')
+    lock_file = None
+    if fcntl is not None:
+        lock_file = open(archive + '.lock', 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+    try:
+        histograms = {}
+        counters = {}
+        for data in (_read_dump(archive), _snapshot()):
+            if data:
+                _merge(histograms, counters, data)
+        _write_dump(archive, {
+            'histograms': [[name, labels, buckets, total, count] for (name, labels), (buckets, total, count) in histograms.items()],
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+        })
+        _reset()
+        try:
+            os.remove(_worker_path())
+        except OSError:
+            pass
+    finally:
+        if lock_file is not None:
+            lock_file.close()
+
+# Función para obtener las métricas de todos los workers (o solo las de este proceso)
+def _collect():
+    if not _shared['dir']:
+        with _lock:
+            return dict(_histograms), dict(_counters)
+    dump_metrics()
+    histograms = {}
+    counters = {}
+    for name in os.listdir(_shared['dir']):
+        if _is_dump(name):
+            data = _read_dump(os.path.join(_shared['dir'], name))
+            if isinstance(data, dict) and 'histograms' in data and 'counters' in data:
+                _merge(histograms, counters, data)
+    return histograms, counters
+
+# Función para generar el texto de /metrics
+def render_metrics():
+    lines = []
+    histograms, counters = _collect()
+    histograms = sorted(histograms.items())
+    counters = sorted(counters.items())
+    seen = set()
+    for (name, labels), (buckets, total, count) in histograms:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f'# TYPE {name} histogram')
+        for bound, value in zip(BUCKETS, buckets):
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {value}')
+        lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {count}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {total:.6f}')
+        lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+    for collector in _collectors:
+        lines.extend(collector())
+    return '\n'.join(lines) + '\n'
+
+# Función para guardar el perfil si la solicitud está entre las más lentas
+def _keep_profile(profiler, seconds):
+    with _lock:
+        if len(_slowest) >= PROFILE_KEEP and seconds <= _slowest[0][0]:
+            return
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f'{int(seconds * 1000):06d}ms-{os.getpid()}-{time.time_ns()}.prof')
+        profiler.dump_stats(path)
+        _slowest.append((seconds, path))
+        _slowest.sort()
+        if len(_slowest) > PROFILE_KEEP:
+            _, old_path = _slowest.pop(0)
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+# Función para registrar los hooks de instrumentación y la ruta /metrics en la aplicación
+def init_app(app):
+    from flask import request
+
+    @app.route('/metrics')
+    def metrics():
+        return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    if not METRICS_ENABLED:
+        return
+
+    # Función para detener el perfilador de la solicitud actual y liberarlo para la siguiente
+    def _stop_profiler():
+        profiler = getattr(_local, 'profiler', None)
+        if profiler is None:
+            return None
+        _local.profiler = None
+        profiler.disable()
+        _profile_lock.release()
+        return profiler
+
+    @app.teardown_request
+    def release_profiler(exc):
+        _stop_profiler()
+
+    @app.before_request
+    def start_request():
+        _local.phases = {}
+        _local.labels = {}
+        _local.start = time.perf_counter()
+        _local.profiler = None
+        if PROFILE_SLOW_MS and _profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Otra herramienta (depurador, cobertura) ya está perfilando el proceso
+                _profile_lock.release()
+            else:
+                _local.profiler = profiler
+
+    @app.after_request
+    def finish_request(response):
+        phases = getattr(_local, 'phases', None)
+        if phases is None:
+            return response
+        seconds = time.perf_counter() - _local.start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        if route == '/metrics':
+            _local.phases = None
+            return response
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        labels = dict(_local.labels, route=route, method=method)
+
+        timings = [f'{phase};dur={duration * 1000:.2f}' for phase, duration in phases.items()]
+        timings.append(f'total;dur={seconds * 1000:.2f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        observe('billing_request_duration_seconds', labels, seconds)
+        for phase, duration in phases.items():
+            observe('billing_phase_duration_seconds', dict(labels, phase=phase), duration)
+        increment('billing_requests_total', dict(labels, status=response.status_code))
+
+        profiler = _stop_profiler()
+        if profiler is not None and seconds * 1000 >= PROFILE_SLOW_MS:
+            _keep_profile(profiler, seconds)
+        _local.phases = None
+        if _shared['dir'] and time.monotonic() - _shared['last_dump'] >= DUMP_INTERVAL:
+            dump_metrics()
+        return response
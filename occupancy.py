@@ -0,0 +1,58 @@
+# Motor de ocupación para N unidades.
+# Las fechas se manejan como ordinales (date.toordinal()) y los intervalos son inclusivos.
+# Un inicio o fin en None significa que la ocupación empieza o termina con el período.
+
+from allocation import allocate_cents
+
+# Función para calcular los días habitados de cada unidad con un barrido de eventos
+def occupied_days(period_start, period_end, units):
+    events = []
+    for unit, tenancies in units.items():
+        for start, end in tenancies:
+            start = period_start if start is None else max(start, period_start)
+            end = period_end if end is None else min(end, period_end)
+            if start <= end:
+                events.append((start, 1, unit))
+                events.append((end + 1, -1, unit))
+    # Los cierres van antes que las aperturas en el mismo día para unir intervalos contiguos
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    days = {unit: 0 for unit in units}
+    active = {unit: 0 for unit in units}
+    opened = {}
+    for position, delta, unit in events:
+        if delta > 0:
+            if active[unit] == 0:
+                opened[unit] = position
+            active[unit] += 1
+        else:
+            active[unit] -= 1
+            if active[unit] == 0:
+                days[unit] += position - opened[unit]
+    return days
+
+# Función para repartir un total en centavos entre las unidades según sus días habitados
+# Devuelve las partes de cada unidad y los centavos que corresponden a días vacíos.
+# Los pesos deben ser enteros para que el reparto sea exacto.
+def split_cents(total_cents, period_start, period_end, units, weights=None, redistribute_vacancy=False):
+    if period_end < period_start:
+        raise ValueError("Billing period ends before it starts")
+    total_days = period_end - period_start + 1
+    days = occupied_days(period_start, period_end, units)
+    if weights is None:
+        weights = {unit: 1 for unit in units}
+
+    names = list(units)
+    unit_weights = occupancy_weights(total_days, [days[unit] for unit in names], [weights[unit] for unit in names], redistribute_vacancy)
+    shares = allocate_cents(total_cents, unit_weights)
+    return dict(zip(names, shares)), shares[-1]
+
+# Función para calcular los pesos de reparto: uno por unidad y la vacancia al final
+# Sin redistribute_vacancy cada unidad paga su parte fija escalada por los días habitados y los días
+# vacíos quedan como vacancia. Con redistribute_vacancy los días vacíos se reparten entre las unidades
+# ocupadas según su peso, así las partes suman el total (si no hay ocupación todo queda como vacancia).
+def occupancy_weights(total_days, days, weights, redistribute_vacancy=False):
+    unit_weights = [weight * unit_days for weight, unit_days in zip(weights, days)]
+    if redistribute_vacancy:
+        return unit_weights + [0 if any(unit_weights) else 1]
+    return unit_weights + [sum(weights) * total_days - sum(unit_weights)]
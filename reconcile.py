@@ -0,0 +1,246 @@
+import argparse
+import csv
+import json
+import re
+import sys
+from collections import defaultdict
+from datetime import date
+
+import ledger
+from allocation import allocate_cents, format_cents, to_cents
+from config_store import property_exists
+from dates import parse_ordinal, resolve_format
+from services import UNITS
+
+# Conciliación de depósitos bancarios con los cargos pendientes del ledger.
+# Uso: python -m reconcile movimientos.csv [--property id] [--payers payers.json] [--tolerance 1] [--late-days 60] [--apply]
+
+DEFAULT_TOLERANCE = 1
+DEFAULT_LATE_DAYS = 60
+
+# Encabezados aceptados en los CSV de los bancos
+BANK_COLUMNS = {
+    'date': ('date', 'transaction_date', 'posted_date', 'posting_date'),
+    'amount': ('amount', 'credit', 'deposit', 'deposits'),
+    'description': ('description', 'memo', 'details', 'payee', 'reference'),
+    'unit': ('unit',),
+}
+
+# Función para leer los depósitos (montos positivos) de un CSV bancario en streaming
+# payers asocia un texto de la descripción (sin distinguir mayúsculas) con una unidad.
+# Devuelve pares (depósito, error): una fila inválida (por ejemplo un pie con totales) no detiene la lectura.
+def read_deposits(source, payers=None, date_format=None):
+    date_format = resolve_format(date_format)
+    payers = [(pattern.lower(), unit) for pattern, unit in (payers or {}).items()]
+    reader = csv.reader(source)
+    header = next(reader, None)
+    if header is None:
+        return
+    names = [re.sub(r'[\s\-]+', '_', name.strip().lower()) for name in header]
+    positions = {}
+    for column, aliases in BANK_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                positions[column] = names.index(alias)
+                break
+    missing = [column for column in ('date', 'amount') if column not in positions]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+
+    for line_number, row in enumerate(reader, 2):
+        if not any(row):
+            continue
+        try:
+            amount = row[positions['amount']].strip().replace('$', '').replace(',', '')
+            if not amount:
+                continue
+            cents = to_cents(amount)
+            if cents <= 0:
+                continue
+            description = row[positions['description']].strip() if 'description' in positions else ''
+            unit = row[positions['unit']].strip().lower() if 'unit' in positions else ''
+            if not unit:
+                lowered = description.lower()
+                unit = next((payer_unit for pattern, payer_unit in payers if pattern in lowered), None)
+            if unit and unit not in UNITS:
+                raise ValueError(f"Unknown unit {unit!r}")
+            deposit = {
+                'line': line_number,
+                'date': parse_ordinal(row[positions['date']].strip(), date_format),
+                'amount_cents': cents,
+                'description': description,
+                'unit': unit or None,
+            }
+        except (IndexError, TypeError, ValueError) as e:
+            yield None, f"Line {line_number}: {e}"
+            continue
+        yield deposit, None
+
+def _ordinal(iso_date):
+    return date.fromisoformat(iso_date).toordinal() if iso_date else None
+
+# Función para calcular los montos que se aceptan como pago de un cargo
+# Cada opción es (tipo, centavos, primer día válido, último día válido).
+def payment_options(charge, late_days):
+    amount = charge['amount_cents']
+    start = _ordinal(charge['period_start'])
+    due = _ordinal(charge['due_date']) or _ordinal(charge['period_end'])
+    last = due + late_days
+    options = [('full', amount, start, last)]
+    early = _ordinal(charge['early_payment_date'])
+    if early and charge['discount_cents']:
+        options.append(('early', amount - charge['discount_cents'], start, early))
+    late_total = charge['late_amount_cents']
+    if late_total and charge['total_cents']:
+        # El monto con recargo se reparte en la misma proporción que el cargo dentro de la factura
+        late = allocate_cents(late_total, [amount, charge['total_cents'] - amount])[0]
+        if late != amount:
+            options.append(('late', late, due + 1, last))
+    return due, options
+
+# Función para conciliar depósitos con cargos pendientes
+# Hash join: los cargos se indexan por (unidad, centavos) de cada monto aceptado y cada depósito
+# busca solo las claves dentro de la tolerancia, recorriendo los depósitos en orden de fecha.
+def reconcile(deposits, charges, tolerance=DEFAULT_TOLERANCE, late_days=DEFAULT_LATE_DAYS):
+    index = defaultdict(list)
+    pending = {}
+    for charge in charges:
+        due, options = payment_options(charge, late_days)
+        pending[charge['id']] = charge
+        for kind, cents, first, last in options:
+            entry = (due, charge['id'], kind, first, last)
+            index[(charge['unit'], cents)].append(entry)
+            index[(None, cents)].append(entry)
+    for entries in index.values():
+        entries.sort()
+
+    offsets = [0]
+    for step in range(1, tolerance + 1):
+        offsets += [-step, step]
+
+    matched = []
+    unmatched_deposits = []
+    for deposit in sorted(deposits, key=lambda deposit: (deposit['date'], deposit['line'])):
+        match = None
+        for offset in offsets:
+            for entry in index.get((deposit['unit'], deposit['amount_cents'] + offset), ()):
+                due, charge_id, kind, first, last = entry
+                if charge_id in pending and first <= deposit['date'] <= last:
+                    match = entry
+                    break
+            if match:
+                break
+        if match is None:
+            unmatched_deposits.append(deposit)
+            continue
+        due, charge_id, kind, _, _ = match
+        charge = pending.pop(charge_id)
+        matched.append(_match_result(deposit, charge, kind, due))
+
+    unmatched_charges = sorted(pending.values(), key=lambda charge: (charge['period_start'], charge['id']))
+    return matched, unmatched_deposits, unmatched_charges
+
+# Función para describir una conciliación: si aplica el descuento, el recargo o ninguno
+def _match_result(deposit, charge, kind, due):
+    if kind == 'early':
+        applies = 'early_discount'
+    elif kind == 'late':
+        applies = 'late_amount'
+    elif deposit['date'] > due:
+        applies = 'late_amount' if charge['late_amount_cents'] else 'late'
+    else:
+        applies = 'none'
+    return {
+        'charge_id': charge['id'],
+        'bill_id': charge['bill_id'],
+        'unit': charge['unit'],
+        'service': charge['service'],
+        'period_start': charge['period_start'],
+        'due_date': charge['due_date'],
+        'amount': format_cents(charge['amount_cents']),
+        'paid': format_cents(deposit['amount_cents']),
+        'paid_at': date.fromordinal(deposit['date']).isoformat(),
+        'applies': applies,
+        'line': deposit['line'],
+        'description': deposit['description'],
+    }
+
+# Función para marcar como pagados los cargos conciliados (agrupados por fecha de pago)
+def apply_matches(matched):
+    by_date = defaultdict(list)
+    for match in matched:
+        by_date[match['paid_at']].append(match['charge_id'])
+    for paid_at, charge_ids in by_date.items():
+        ledger.mark_paid(charge_ids, paid_at)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m reconcile', description='Match bank deposits to outstanding per-unit charges in the ledger.')
+    parser.add_argument('input', help="bank transactions CSV ('-' for stdin)")
+    parser.add_argument('--property', help='property id whose charges are reconciled (the default property when omitted)')
+    parser.add_argument('--payers', help='JSON file mapping description text to a unit, e.g. {"SMITH": "upper"}')
+    parser.add_argument('--date-format', help='date format of the CSV dates (dmy, mdy or iso)')
+    parser.add_argument('--tolerance', type=int, default=DEFAULT_TOLERANCE, help='accepted difference in cents')
+    parser.add_argument('--late-days', type=int, default=DEFAULT_LATE_DAYS, help='days after the due date a deposit can still match')
+    parser.add_argument('--apply', action='store_true', help='mark matched charges as paid in the ledger')
+    args = parser.parse_args(argv)
+    if args.property and not property_exists(args.property):
+        parser.error(f"Unknown property {args.property!r}")
+
+    payers = None
+    if args.payers:
+        with open(args.payers, 'r', encoding='utf-8') as file:
+            payers = json.load(file)
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8-sig', newline='')
+    deposits = []
+    errors = []
+    try:
+        for deposit, error in read_deposits(source, payers, args.date_format):
+            if error:
+                errors.append(error)
+            else:
+                deposits.append(deposit)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    matched, unmatched_deposits, unmatched_charges = reconcile(
+        deposits, ledger.query_charges(outstanding=True, property_id=args.property), args.tolerance, args.late_days
+    )
+    if args.apply:
+        apply_matches(matched)
+
+    report = {
+        'matched': matched,
+        'unmatched_deposits': [
+            {
+                'line': deposit['line'],
+                'date': date.fromordinal(deposit['date']).isoformat(),
+                'amount': format_cents(deposit['amount_cents']),
+                'unit': deposit['unit'],
+                'description': deposit['description'],
+            }
+            for deposit in unmatched_deposits
+        ],
+        'unmatched_charges': [
+            {
+                'charge_id': charge['id'],
+                'unit': charge['unit'],
+                'service': charge['service'],
+                'period_start': charge['period_start'],
+                'due_date': charge['due_date'],
+                'amount': format_cents(charge['amount_cents']),
+            }
+            for charge in unmatched_charges
+        ],
+        'errors': errors,
+    }
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    print(f"Matched {len(matched)} deposits, {len(unmatched_deposits)} unmatched deposits, {len(unmatched_charges)} outstanding charges, {len(errors)} unreadable lines", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
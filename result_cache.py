@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Caché de resultados de facturas (LRU con vencimiento) y un respaldo opcional en disco
+# compartido entre workers (RESULT_CACHE_DB). La clave ya incluye las fechas de las unidades
+# del formulario, así un cambio de fechas nunca reutiliza un resultado anterior.
+
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 1024))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 300))
+RESULT_CACHE_DB = os.environ.get('RESULT_CACHE_DB')
+
+class ResultCache:
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_writes = 0
+
+    # Función para obtener la conexión en disco del hilo actual
+    def _disk(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.evictions += 1
+        if self.path:
+            row = self._disk().execute(
+                'SELECT value FROM results WHERE key = ? AND expires > ?',
+                (self._disk_key(key), time.time()),
+            ).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value, now)
+                with self._lock:
+                    self.hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value, time.monotonic())
+        if self.path:
+            connection = self._disk()
+            with connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)',
+                    (self._disk_key(key), json.dumps(value), time.time() + self.ttl),
+                )
+                self._disk_writes += 1
+                if self._disk_writes % 1000 == 0:
+                    connection.execute('DELETE FROM results WHERE expires <= ?', (time.time(),))
+
+    def _remember(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_key(self, key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            connection = self._disk()
+            with connection:
+                connection.execute('DELETE FROM results')
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._entries)}
+
+    # Función para exportar las estadísticas en formato Prometheus
+    def metric_lines(self):
+        stats = self.stats()
+        return [
+            '# TYPE billing_result_cache_hits_total counter',
+            f"billing_result_cache_hits_total {stats['hits']}",
+            '# TYPE billing_result_cache_misses_total counter',
+            f"billing_result_cache_misses_total {stats['misses']}",
+            '# TYPE billing_result_cache_evictions_total counter',
+            f"billing_result_cache_evictions_total {stats['evictions']}",
+            '# TYPE billing_result_cache_entries gauge',
+            f"billing_result_cache_entries {stats['size']}",
+        ]
+
+bill_cache = ResultCache(path=RESULT_CACHE_DB)
+
+# Función para calcular una factura usando la caché
+def cached_bill(form, compute, make_key):
+    try:
+        key = make_key(form)
+    except (TypeError, ValueError):
+        # Entradas inválidas: el cálculo normal produce el error correspondiente
+        return compute(form)
+    bill = bill_cache.get(key)
+    if bill is None:
+        bill = compute(form)
+        bill_cache.put(key, bill)
+    return dict(bill)
@@ -0,0 +1,232 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from billing import split_weights, unit_days
+from dates import Period, optional_ordinal
+from services import SERVICES, get_service
+
+# Calendario de facturación: precalcula los próximos períodos de cada servicio según su ciclo
+# (services.json) y genera en segundo plano los borradores de reparto con las fechas de las
+# unidades guardadas en la configuración. Abrir un período es una búsqueda en memoria.
+# Cuando cambian las fechas de las unidades solo se recalculan los borradores afectados.
+
+SCHEDULE_AHEAD = int(os.environ.get('SCHEDULE_AHEAD', 3))
+SCHEDULE_WORKERS = int(os.environ.get('SCHEDULE_WORKERS', 2))
+SCHEDULE_PROPERTIES = int(os.environ.get('SCHEDULE_PROPERTIES', 256))
+DISPLAY_FORMAT = '%d/%m/%Y'
+TENANCY_KEYS = ('upper_unit_start_date', 'lower_unit_start_date', 'upper_unit_end_date', 'lower_unit_end_date')
+
+# Función para sumar meses a una fecha (el día se ajusta al último día del mes si hace falta)
+def add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    last_day = (next_month - timedelta(days=1)).day
+    return date(year, month, min(day.day, last_day))
+
+# Función para obtener el inicio del período número index de un ciclo
+def _cycle_start(cycle, index):
+    if cycle['months']:
+        return add_months(cycle['anchor'], index * cycle['months'])
+    return cycle['anchor'] + timedelta(days=index * cycle['days'])
+
+# Función para calcular los períodos de un servicio alrededor de hoy
+# Incluye el último período cerrado (la factura que suele llegar ahora), el actual y SCHEDULE_AHEAD más.
+def cycle_periods(service, today, ahead=SCHEDULE_AHEAD):
+    cycle = service['cycle']
+    if cycle['months']:
+        index = ((today.year - cycle['anchor'].year) * 12 + today.month - cycle['anchor'].month) // cycle['months']
+    else:
+        index = (today - cycle['anchor']).days // cycle['days']
+    if _cycle_start(cycle, index) > today:
+        index -= 1
+    periods = []
+    for offset in range(-1, ahead + 1):
+        start = _cycle_start(cycle, index + offset)
+        end = _cycle_start(cycle, index + offset + 1) - timedelta(days=1)
+        early_days = cycle['early_payment_days']
+        early = end + timedelta(days=early_days) if early_days is not None else None
+        from_date = start.strftime(DISPLAY_FORMAT)
+        to_date = end.strftime(DISPLAY_FORMAT)
+        periods.append({
+            'start': start,
+            'end': end,
+            'first': start.toordinal(),
+            'last': end.toordinal(),
+            'status': 'closed' if end < today else 'current' if start <= today else 'upcoming',
+            'fields': {
+                'from_date': from_date,
+                'to_date': to_date,
+                'date_range': f'{from_date} to {to_date}',
+                'due_date': (end + timedelta(days=cycle['due_days'])).strftime(DISPLAY_FORMAT),
+                'early_payment_date': early.strftime(DISPLAY_FORMAT) if early else None,
+            },
+        })
+    return periods
+
+_calendar = {'key': None, 'services': None}
+
+# Función para obtener los períodos de todos los servicios con ciclo
+# No dependen de la propiedad, así que se calculan una sola vez por día para todas.
+def calendar(today, ahead=SCHEDULE_AHEAD):
+    key = (today, ahead)
+    cached = _calendar['services']
+    if _calendar['key'] == key:
+        return cached
+    services = [(service, cycle_periods(service, today, ahead)) for service in SERVICES if service['cycle']]
+    _calendar['services'] = services
+    _calendar['key'] = key
+    return services
+
+# Función para leer las fechas de las unidades de la configuración como ordinales
+def config_tenancy(config):
+    tenancy = []
+    for key in TENANCY_KEYS:
+        try:
+            tenancy.append(optional_ordinal(config.get(key)))
+        except ValueError:
+            tenancy.append(None)
+    return tuple(tenancy)
+
+# Función para recortar las fechas de las unidades al período
+# Dos juegos de fechas con el mismo recorte dan el mismo reparto, así el borrador sigue siendo válido.
+def period_bounds(start, end, tenancy):
+    upper_start, lower_start, upper_end, lower_end = tenancy
+    return (
+        min(max(upper_start or start, start), end + 1),
+        min(max(lower_start or start, start), end + 1),
+        max(min(upper_end or end, end), start - 1),
+        max(min(lower_end or end, end), start - 1),
+    )
+
+# Función para generar el borrador de un período: fechas del formulario y pesos de reparto
+def build_draft(service, period, bounds):
+    upper_start, lower_start, upper_end, lower_end = bounds
+    days = unit_days(Period(period['first'], period['last'], upper_start, upper_end, lower_start, lower_end))
+    return {
+        'service_choice': service['id'],
+        'status': period['status'],
+        **period['fields'],
+        'total_days': days[0],
+        'upper_days': days[1],
+        'lower_days': days[2],
+        'weights': {
+            component['key']: split_weights(component['split'], *days, component.get('weights'), component['redistribute_vacancy'])
+            for component in service['components']
+        },
+    }
+
+_executor = {'pool': None, 'pid': None}
+_executor_lock = threading.Lock()
+
+# Función para obtener el pool de trabajo del proceso actual, compartido por todas las propiedades
+# (se crea después del fork)
+def _pool(workers):
+    with _executor_lock:
+        if _executor['pool'] is None or _executor['pid'] != os.getpid():
+            _executor['pool'] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='drafts')
+            _executor['pid'] = os.getpid()
+        return _executor['pool']
+
+class DraftSchedule:
+    def __init__(self, workers=SCHEDULE_WORKERS, ahead=SCHEDULE_AHEAD):
+        self.workers = workers
+        self.ahead = ahead
+        self.computed = 0
+        self._drafts = {}
+        self._wanted = {}
+        self._periods = {}
+        self._generation = None
+        self._lock = threading.Lock()
+
+    # Función para actualizar los períodos y encargar solo los borradores que cambiaron
+    def refresh(self, config, today=None):
+        today = today or date.today()
+        tenancy = config_tenancy(config)
+        with self._lock:
+            if self._generation == (today, tenancy):
+                return 0
+            self._generation = (today, tenancy)
+            wanted = {}
+            periods = {}
+            jobs = []
+            for service, service_periods in calendar(today, self.ahead):
+                for period in service_periods:
+                    key = (service['id'], period['first'])
+                    bounds = period_bounds(period['first'], period['last'], tenancy)
+                    wanted[key] = (bounds, period['status'])
+                    periods.setdefault(service['id'], []).append((key, period, bounds))
+                    draft = self._drafts.get(key)
+                    if draft is None or draft['_bounds'] != bounds or draft['status'] != period['status']:
+                        jobs.append((key, service, period, bounds))
+            self._wanted = wanted
+            self._periods = periods
+            for key in list(self._drafts):
+                if key not in wanted:
+                    del self._drafts[key]
+        if self.workers > 0 and jobs:
+            _pool(self.workers).submit(self._compute_all, jobs)
+        return len(jobs)
+
+    # Función para encargar la actualización al pool sin demorar la respuesta
+    def refresh_in_background(self, config):
+        if self.workers <= 0:
+            self.refresh(config)
+        elif self._generation != (date.today(), config_tenancy(config)):
+            _pool(self.workers).submit(self.refresh, config)
+
+    def _compute_all(self, jobs):
+        for job in jobs:
+            self._compute(*job)
+
+    def _compute(self, key, service, period, bounds):
+        draft = build_draft(service, period, bounds)
+        draft['_bounds'] = bounds
+        with self._lock:
+            # Un borrador encargado antes de otro cambio de fechas ya no sirve
+            if self._wanted.get(key) == (bounds, period['status']):
+                self._drafts[key] = draft
+                self.computed += 1
+        return draft
+
+    # Función para obtener los borradores de un servicio (los que faltan se calculan en el momento)
+    def drafts(self, service_id, config, today=None):
+        service = get_service(service_id)
+        if not service['cycle']:
+            return []
+        self.refresh(config, today)
+        with self._lock:
+            periods = self._periods.get(service['id'], [])
+            drafts = [self._drafts.get(key) for key, _, _ in periods]
+        result = []
+        for (key, period, bounds), draft in zip(periods, drafts):
+            if draft is None or draft['_bounds'] != bounds:
+                draft = self._compute(key, service, period, bounds)
+            result.append({name: value for name, value in draft.items() if name != '_bounds'})
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'drafts': len(self._drafts), 'computed': self.computed}
+
+draft_schedule = DraftSchedule()
+_property_schedules = OrderedDict()
+_property_lock = threading.Lock()
+
+# Función para obtener el calendario de una propiedad (los menos usados se descartan)
+def schedule_for(property_id=None):
+    if property_id is None:
+        return draft_schedule
+    with _property_lock:
+        schedule = _property_schedules.get(property_id)
+        if schedule is None:
+            schedule = _property_schedules[property_id] = DraftSchedule()
+            while len(_property_schedules) > SCHEDULE_PROPERTIES:
+                _property_schedules.popitem(last=False)
+        else:
+            _property_schedules.move_to_end(property_id)
+        return schedule
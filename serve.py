@@ -0,0 +1,120 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+# Servidor de producción para la aplicación.
+# Usa gunicorn (workers pre-fork con hilos) y, si no está disponible (Windows), waitress.
+# Uso: python -m serve [--workers N] [--threads N] [--bind 0.0.0.0:5000]
+# Recarga sin cortar conexiones: kill -HUP <pid del proceso principal>
+
+# Valores por defecto pensados para un servicio pequeño con E/S a disco (config y ledger)
+DEFAULT_WORKERS = min(multiprocessing.cpu_count() * 2 + 1, 8)
+DEFAULT_THREADS = 4
+DEFAULT_TIMEOUT = 30
+DEFAULT_KEEPALIVE = 5
+DEFAULT_GRACEFUL_TIMEOUT = 30
+DEFAULT_MAX_REQUESTS = 2000
+
+# Función para guardar la configuración pendiente y las métricas antes de que un worker termine
+def worker_exit(server, worker):
+    from config_store import flush_config
+    import metrics
+    flush_config()
+    metrics.retire_worker()
+
+# Función para preparar el directorio donde los workers suman sus métricas (METRICS_DIR)
+# De un METRICS_DIR indicado solo se borran los volcados de una ejecución anterior; si no se indica,
+# se usa un directorio temporal propio (devuelto para borrarlo al terminar el proceso principal).
+def prepare_metrics_dir():
+    import metrics
+    directory = os.environ.get('METRICS_DIR')
+    owned = None
+    if directory:
+        metrics.clear_metrics_dir(directory)
+    else:
+        directory = owned = tempfile.mkdtemp(prefix='billing-metrics-')
+    os.environ['METRICS_DIR'] = directory
+    metrics.set_metrics_dir(directory)
+    return owned
+
+# Función para arrancar gunicorn con la aplicación
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    owned_metrics_dir = prepare_metrics_dir()
+
+    # on_exit solo corre en el proceso principal (un atexit también correría en cada worker)
+    def on_exit(server):
+        if owned_metrics_dir:
+            shutil.rmtree(owned_metrics_dir, ignore_errors=True)
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': args.bind,
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread',
+                'timeout': args.timeout,
+                'graceful_timeout': args.graceful_timeout,
+                'keepalive': args.keep_alive,
+                'max_requests': args.max_requests,
+                'max_requests_jitter': args.max_requests // 10,
+                'worker_exit': worker_exit,
+                'on_exit': on_exit,
+                'accesslog': '-' if args.access_log else None,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    Application().run()
+
+# Función para arrancar waitress (un proceso, varios hilos)
+def run_waitress(args):
+    from waitress import serve
+    from app import app
+
+    host, _, port = args.bind.rpartition(':')
+    serve(
+        app,
+        host=host or '0.0.0.0',
+        port=int(port),
+        threads=args.workers * args.threads,
+        channel_timeout=args.timeout,
+    )
+
+def main(argv=None):
+    port = int(os.environ.get('PORT', 5000))
+    parser = argparse.ArgumentParser(prog='python -m serve', description='Run the billing generator with a production WSGI server.')
+    parser.add_argument('--bind', default=os.environ.get('BIND', f'0.0.0.0:{port}'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', DEFAULT_WORKERS)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', DEFAULT_THREADS)))
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT, help='seconds before a stuck request is aborted')
+    parser.add_argument('--graceful-timeout', type=int, default=DEFAULT_GRACEFUL_TIMEOUT)
+    parser.add_argument('--keep-alive', type=int, default=DEFAULT_KEEPALIVE, help='seconds to hold idle keep-alive connections')
+    parser.add_argument('--max-requests', type=int, default=DEFAULT_MAX_REQUESTS, help='recycle a worker after this many requests')
+    parser.add_argument('--access-log', action='store_true')
+    parser.add_argument('--server', choices=['gunicorn', 'waitress'], default=None)
+    args = parser.parse_args(argv)
+
+    server = args.server
+    if server is None:
+        try:
+            import gunicorn  # noqa: F401
+            server = 'gunicorn'
+        except ImportError:
+            server = 'waitress'
+    if server == 'gunicorn':
+        run_gunicorn(args)
+    else:
+        run_waitress(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import json
+import os
+from datetime import date
+
+# Registro de servicios y de los componentes de cada factura, cargado una sola vez desde services.json.
+# Reglas de reparto de un componente ("split"):
+#   occupancy  cada unidad paga la mitad escalada por sus días habitados (el resto es vacancia)
+#   equal      mitades iguales sin considerar fechas
+#   fixed      pesos fijos por unidad, por ejemplo {"upper": 60, "lower": 40}
+# "discount" indica si el componente participa del descuento por pago anticipado.
+# "redistribute_vacancy" reparte los días vacíos entre las unidades ocupadas (regla occupancy),
+# así las partes de las unidades suman exactamente el total; si no, la vacancia no se cobra.
+# "cycle" (opcional) describe el ciclo de facturación del servicio:
+#   months o days        largo del período
+#   anchor               inicio de un período cualquiera (AAAA-MM-DD)
+#   due_days             días entre el fin del período y el vencimiento
+#   early_payment_days   días entre el fin del período y la fecha de pago anticipado
+
+services_file = os.environ.get('SERVICES_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'services.json'))
+
+SPLIT_RULES = ('occupancy', 'equal', 'fixed')
+UNITS = ('upper', 'lower')
+
+# Función para validar y completar la definición de un servicio
+def _normalize_service(service):
+    service = dict(service)
+    service['id'] = int(service['id'])
+    service.setdefault('text_name', service['name'])
+    service.setdefault('logo', None)
+    service.setdefault('details_title', None)
+    service['early_payment_discount'] = bool(service.get('early_payment_discount', False))
+    components = []
+    for component in service['components']:
+        component = dict(component)
+        component.setdefault('field', f"{component['key']}_amount")
+        component.setdefault('label', component['key'].title())
+        component.setdefault('split', 'occupancy')
+        component['discount'] = bool(component.get('discount', False))
+        component['redistribute_vacancy'] = bool(component.get('redistribute_vacancy', False))
+        if component['split'] not in SPLIT_RULES:
+            raise ValueError(f"Unknown split rule {component['split']!r} for {service['name']}/{component['key']}")
+        if component['split'] == 'fixed':
+            component['weights'] = [int(component['weights'][unit]) for unit in UNITS]
+        components.append(component)
+    if not components:
+        raise ValueError(f"Service {service['name']} has no components")
+    service['components'] = components
+    service['cycle'] = _normalize_cycle(service) if service.get('cycle') else None
+    return service
+
+# Función para validar el ciclo de facturación de un servicio
+def _normalize_cycle(service):
+    cycle = dict(service['cycle'])
+    if bool(cycle.get('months')) == bool(cycle.get('days')):
+        raise ValueError(f"Cycle for {service['name']} needs either months or days")
+    cycle['months'] = int(cycle.get('months') or 0)
+    cycle['days'] = int(cycle.get('days') or 0)
+    cycle['anchor'] = date.fromisoformat(cycle['anchor'])
+    cycle['due_days'] = int(cycle.get('due_days', 0))
+    if cycle.get('early_payment_days') is not None:
+        cycle['early_payment_days'] = int(cycle['early_payment_days'])
+    else:
+        cycle['early_payment_days'] = None
+    return cycle
+
+# Función para cargar el registro de servicios
+def load_services(path=None):
+    with open(path or services_file, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    return [_normalize_service(service) for service in data['services']]
+
+SERVICES = load_services()
+SERVICES_BY_ID = {service['id']: service for service in SERVICES}
+
+# Función para obtener un servicio por su número (service_choice)
+def get_service(service_id):
+    service = SERVICES_BY_ID.get(int(service_id))
+    if service is None:
+        raise ValueError(f"Unknown service_choice {service_id}")
+    return service
@@ -0,0 +1,142 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Initialize Flatpickr for single date selection
+    flatpickr('.datepicker', {
+        dateFormat: 'd/m/Y',
+        allowInput: true
+    });
+    // Initialize Flatpickr for date range selection
+    flatpickr('.daterange', {
+        mode: 'range',
+        dateFormat: 'd/m/Y',
+        allowInput: true
+    });
+    // Recalcular la vista previa cuando cambia el formulario
+    var form = document.getElementById("billing_form");
+    form.addEventListener("input", schedulePreview);
+    form.addEventListener("change", schedulePreview);
+});
+
+var previewTimer = null;
+var previewRequest = null;
+
+function schedulePreview() {
+    clearTimeout(previewTimer);
+    previewTimer = setTimeout(updatePreview, 250);
+}
+
+function updatePreview() {
+    var form = document.getElementById("billing_form");
+    var preview = document.getElementById("preview");
+    var previewText = document.getElementById("preview_text");
+    if (previewRequest) {
+        previewRequest.abort();
+    }
+    previewRequest = new AbortController();
+    fetch(form.dataset.previewUrl, {
+        method: "POST",
+        body: new FormData(form),
+        signal: previewRequest.signal
+    }).then(function(response) {
+        return response.json().then(function(data) {
+            if (response.ok) {
+                previewText.value = data.text;
+                preview.style.display = "flex";
+            } else {
+                preview.style.display = "none";
+            }
+        });
+    }).catch(function(error) {
+        if (error.name !== "AbortError") {
+            preview.style.display = "none";
+        }
+    });
+}
+
+function toggleDateFields() {
+    var checkBox = document.getElementById("consider_dates");
+    var dateFields = document.getElementById("date_fields");
+    if (checkBox.checked == true){
+        dateFields.style.display = "block";
+    } else {
+        dateFields.style.display = "none";
+    }
+}
+
+function toggleEndDateFields() {
+    var checkBox = document.getElementById("consider_end_dates");
+    var endDateFields = document.getElementById("end_date_fields");
+    if (checkBox.checked == true){
+        endDateFields.style.display = "block";
+    } else {
+        endDateFields.style.display = "none";
+    }
+}
+
+function toggleServiceLogo() {
+    var serviceSelect = document.getElementById("service_choice");
+    var serviceChoice = serviceSelect.value;
+    var serviceLogo = document.getElementById("service_logo");
+    var logo = serviceSelect.options[serviceSelect.selectedIndex].dataset.logo;
+    if (logo) {
+        serviceLogo.src = logo;
+        serviceLogo.style.display = "block";
+    } else {
+        serviceLogo.style.display = "none";
+    }
+    // Mostrar solo los campos del servicio elegido; los campos ocultos se desactivan para no enviarse
+    var sections = document.querySelectorAll(".service-details");
+    for (var i = 0; i < sections.length; i++) {
+        var active = sections[i].dataset.service == serviceChoice;
+        sections[i].style.display = active ? "block" : "none";
+        var inputs = sections[i].querySelectorAll("input");
+        for (var j = 0; j < inputs.length; j++) {
+            inputs[j].disabled = !active;
+        }
+    }
+    prefillPeriod(serviceChoice);
+}
+
+// Completar las fechas vacías con el último período cerrado del calendario del servicio
+function prefillPeriod(serviceChoice) {
+    var form = document.getElementById("billing_form");
+    if (!form.dataset.scheduleUrl) {
+        return;
+    }
+    fetch(form.dataset.scheduleUrl + "?service=" + encodeURIComponent(serviceChoice)).then(function(response) {
+        return response.ok ? response.json() : {drafts: []};
+    }).then(function(data) {
+        var draft = null;
+        for (var i = 0; i < data.drafts.length; i++) {
+            if (data.drafts[i].status == "closed") {
+                draft = data.drafts[i];
+            }
+        }
+        if (!draft || document.getElementById("service_choice").value != serviceChoice) {
+            return;
+        }
+        setEmptyDate(document.getElementById("date_range"), [draft.from_date, draft.to_date]);
+        setEmptyDate(document.getElementById("due_date"), draft.due_date);
+        if (draft.early_payment_date) {
+            setEmptyDate(document.getElementById("service" + serviceChoice + "_early_payment_date"), draft.early_payment_date);
+        }
+        schedulePreview();
+    }).catch(function() {});
+}
+
+function setEmptyDate(input, value) {
+    if (!input || input.value) {
+        return;
+    }
+    if (input._flatpickr) {
+        input._flatpickr.setDate(value, false);
+    } else {
+        input.value = Array.isArray(value) ? value.join(" to ") : value;
+    }
+}
+
+function copyToClipboard() {
+    var copyText = document.getElementById("generated_text");
+    copyText.select();
+    document.execCommand("copy");
+    alert("Copied the text: " + copyText.value);
+}
@@ -0,0 +1,83 @@
+import math
+import random
+
+import pytest
+
+from allocation import allocate_batch, allocate_cents, allocate_discount, format_cents, to_cents
+
+def random_rows(count, seed=7):
+    rng = random.Random(seed)
+    totals = [rng.randint(0, 10_000_000) for _ in range(count)]
+    rows = [[rng.randint(0, 60) for _ in range(3)] for _ in range(count)]
+    for row in rows:
+        if not any(row):
+            row[0] = 1
+    return totals, rows
+
+@pytest.mark.parametrize('value, cents', [
+    ('10.125', 1013),
+    ('10.124', 1012),
+    ('0.005', 1),
+    ('-10.125', -1013),
+    ('100', 10000),
+    ('.5', 50),
+    (' 7.1 ', 710),
+    (12, 1200),
+    (0.1 + 0.2, 30),
+    ('1e2', 10000),
+])
+def test_to_cents(value, cents):
+    assert to_cents(value) == cents
+
+@pytest.mark.parametrize('value', [None, True, '', 'abc', '1.2.3', 'inf', '-inf', 'nan', '1e999', math.inf, math.nan])
+def test_to_cents_rejects_invalid_amounts(value):
+    with pytest.raises(ValueError):
+        to_cents(value)
+
+def test_format_cents():
+    assert [format_cents(cents) for cents in (0, 5, 1013, -1013, -5)] == ['0.00', '0.05', '10.13', '-10.13', '-0.05']
+
+def test_allocate_cents_sums_to_total():
+    totals, rows = random_rows(3000)
+    for total, weights in zip(totals, rows):
+        shares = allocate_cents(total, weights)
+        assert sum(shares) == total
+        # Cada parte difiere de la proporción exacta en menos de un centavo
+        for share, weight in zip(shares, weights):
+            assert abs(share - total * weight / sum(weights)) < 1
+
+def test_allocate_cents_ties_go_to_the_first():
+    assert allocate_cents(1, [1, 1]) == [1, 0]
+    assert allocate_cents(2, [1, 1, 1]) == [1, 1, 0]
+    assert allocate_cents(1013, [1, 1]) == [507, 506]
+
+def test_allocate_cents_zero_weights():
+    assert allocate_cents(0, [0, 0, 0]) == [0, 0, 0]
+    with pytest.raises(ValueError):
+        allocate_cents(100, [0, 0])
+
+def test_allocate_discount_sums_to_discount_within_units():
+    # Sin vacancia el descuento se reparte completo entre las unidades
+    assert sum(allocate_discount(501, [8003, 2001], [[5000, 3003], [1000, 1001]])) == 501
+    # Con vacancia la parte de los días vacíos no se asigna a ninguna unidad
+    discounts = allocate_discount(501, [8003, 2001], [[4000, 2003], [1000, 500]])
+    assert sum(discounts) < 501
+    assert allocate_discount(0, [100], [[50, 50]]) == [0, 0]
+
+def test_allocate_batch_python_matches_allocate_cents():
+    totals, rows = random_rows(500)
+    assert allocate_batch(totals, rows) == [allocate_cents(total, weights) for total, weights in zip(totals, rows)]
+
+def test_allocate_batch_numpy_matches_python():
+    np = pytest.importorskip('numpy')
+    totals, rows = random_rows(3000)
+    rows[0] = [1, 1, 0]
+    totals[0] = 1
+    rows[1] = [1, 1, 1]
+    totals[1] = 2
+    assert allocate_batch(totals, rows, np) == allocate_batch(totals, rows)
+
+def test_allocate_batch_numpy_rejects_zero_weights():
+    np = pytest.importorskip('numpy')
+    with pytest.raises(ValueError):
+        allocate_batch([100], [[0, 0, 0]], np)
@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+
+import pytest
+from markupsafe import escape
+
+# Estado aislado: configuración, ledger y propiedades en un directorio temporal (antes de importar la app)
+state_dir = tempfile.mkdtemp(prefix='billing-test-')
+with open(os.path.join(state_dir, 'config.json'), 'w') as file:
+    json.dump({"upper_unit_start_date": "01/02/2024", "lower_unit_start_date": "14/02/2024"}, file)
+os.environ['CONFIG_FILE'] = os.path.join(state_dir, 'config.json')
+os.environ['LEDGER_DB'] = os.path.join(state_dir, 'ledger.db')
+os.environ['LEGACY_LEDGER_FILE'] = os.path.join(state_dir, 'ledger.json')
+os.environ['PROPERTIES_DIR'] = os.path.join(state_dir, 'properties')
+os.environ.pop('RESULT_CACHE_DB', None)
+os.environ.pop('METRICS_DIR', None)
+
+import app as app_module  # noqa: E402
+from services import SERVICES  # noqa: E402
+
+# Los templates se compilan al importar la app: compilar durante una petición es un error
+@pytest.fixture
+def client(monkeypatch):
+    compiled = []
+
+    def fail_compile(*args, **kwargs):
+        compiled.append(args)
+        raise AssertionError("template compiled during a request")
+
+    monkeypatch.setattr(app_module.template_env, 'compile', fail_compile)
+    monkeypatch.setattr(app_module.app.jinja_env, 'compile', fail_compile)
+    app_module.shell_cache.clear()
+    app_module.bill_cache.clear()
+    yield app_module.app.test_client()
+    assert not compiled
+
+def bill_form(service):
+    form = {
+        'service_choice': str(service['id']),
+        'date_range': '01/02/2024 to 29/02/2024',
+        'due_date': '20/03/2024',
+        'date_format': 'dmy',
+    }
+    for index, component in enumerate(service['components']):
+        form[component['field']] = f'{100 + index}.25'
+    if service['early_payment_discount']:
+        form['early_payment_discount'] = '5.01'
+        form['early_payment_date'] = '10/03/2024'
+    return form
+
+def test_get_index(client):
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'Billing Text Generator' in response.data
+    # La segunda petición usa la página pre-renderizada
+    assert client.get('/').data == response.data
+
+@pytest.mark.parametrize('service', SERVICES, ids=lambda service: service['name'])
+def test_post_each_service(client, service):
+    response = client.post('/', data=bill_form(service))
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert escape(service['text_name']) in page
+    assert 'DUE DATE: 20/03/2024' in page
+
+@pytest.mark.parametrize('service', SERVICES, ids=lambda service: service['name'])
+def test_preview_matches_form(client, service):
+    form = bill_form(service)
+    preview = client.post('/api/preview', data=form).get_json()
+    page = client.post('/', data=form).get_data(as_text=True)
+    assert escape(preview['text']) in page
+
+def test_preview_rejects_json_array(client):
+    response = client.post('/api/preview', json=[{'service_choice': '1'}])
+    assert response.status_code == 400
+
+def test_free_text_due_date(client):
+    form = dict(bill_form(SERVICES[0]), due_date='March 20, 2024')
+    response = client.post('/', data=form)
+    assert response.status_code == 200
+    assert 'DUE DATE: MARCH 20, 2024' in response.get_data(as_text=True)
+    assert client.post('/api/preview', data=form).status_code == 200
+
+@pytest.mark.parametrize('due_date', [None, 5])
+def test_batch_rejects_non_string_due_date(client, due_date):
+    bill = {'service_choice': 1, 'amount': '10', 'from_date': '01/02/2024', 'to_date': '29/02/2024', 'due_date': due_date}
+    response = client.post('/api/bills', json=[bill])
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Bill 0:')
+
+@pytest.mark.parametrize('body', [
+    {'service_choice': [1]},
+    {'date_range': 5},
+    {'due_date': {'day': 5}},
+    {'date_format': ['x']},
+    {'consider_dates': True},
+])
+def test_preview_rejects_bad_json_fields(client, body):
+    fields = dict(bill_form(SERVICES[0]), **body)
+    response = client.post('/api/preview', json=fields)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_preview_accepts_json_numbers(client):
+    fields = dict(bill_form(SERVICES[0]), service_choice=1, amount=100.25, due_date=5)
+    response = client.post('/api/preview', json=fields)
+    assert response.status_code == 200
+    assert response.get_json()['total'] == 100.25
+    assert response.get_json()['due_date'] == '5'
+
+def test_calculate_proportions_matches_form(client):
+    from billing import calculate_proportions, compute_bill
+    form = dict(bill_form(SERVICES[0]), amount='100', consider_dates='on', upper_unit_start_date='', lower_unit_start_date='14/02/2024')
+    bill = compute_bill(form)
+    assert calculate_proportions('100', '01/02/2024', '29/02/2024', None, '14/02/2024', None, None, True, False) == (bill['upper_amount'], bill['lower_amount'])
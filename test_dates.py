@@ -0,0 +1,53 @@
+from datetime import date
+
+import pytest
+
+from dates import make_period, parse_ordinal, resolve_format
+
+@pytest.mark.parametrize('text, date_format, expected', [
+    ('01/02/2024', 'dmy', date(2024, 2, 1)),
+    ('01/02/2024', 'mdy', date(2024, 1, 2)),
+    ('2024-02-01', 'iso', date(2024, 2, 1)),
+    ('1/2/2024', 'dmy', date(2024, 2, 1)),
+    (' 29/02/2024 ', 'dmy', date(2024, 2, 29)),
+    ('02/29/2024', 'mdy', date(2024, 2, 29)),
+])
+def test_parse_ordinal(text, date_format, expected):
+    assert parse_ordinal(text, date_format) == expected.toordinal()
+
+@pytest.mark.parametrize('text, date_format', [
+    ('2024-02-01', 'dmy'),
+    ('01/02/2024', 'iso'),
+    ('13/13/2024', 'dmy'),
+    ('13/01/2024', 'mdy'),
+    ('30/02/2024', 'dmy'),
+    ('29/02/2023', 'dmy'),
+    ('01/02/24', 'dmy'),
+    ('001/02/2024', 'dmy'),
+    ('01/02/2024/1', 'dmy'),
+    ('aa/02/2024', 'dmy'),
+    ('-1/02/2024', 'dmy'),
+    ('０1/02/2024', 'dmy'),
+    ('', 'dmy'),
+    (None, 'dmy'),
+    (20240201, 'iso'),
+])
+def test_parse_ordinal_rejects_invalid_dates(text, date_format):
+    with pytest.raises(ValueError):
+        parse_ordinal(text, date_format)
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        resolve_format('ymd')
+    with pytest.raises(ValueError):
+        parse_ordinal('01/02/2024', 'ymd')
+
+def test_make_period():
+    period = make_period('01/02/2024', '29/02/2024', lower_start='14/02/2024', date_format='dmy')
+    assert period.total_days == 29
+    assert period.lower_start == date(2024, 2, 14).toordinal()
+    assert period.upper_start is period.upper_end is period.lower_end is None
+
+def test_make_period_rejects_reversed_period():
+    with pytest.raises(ValueError):
+        make_period('29/02/2024', '01/02/2024', date_format='dmy')
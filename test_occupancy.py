@@ -0,0 +1,57 @@
+from datetime import date
+
+import pytest
+
+from occupancy import occupancy_weights, occupied_days, split_cents
+
+def day(text):
+    return date.fromisoformat(text).toordinal()
+
+FEB_START = day('2024-02-01')
+FEB_END = day('2024-02-29')
+
+def test_open_tenancy_covers_the_period():
+    assert occupied_days(FEB_START, FEB_END, {'upper': [(None, None)]}) == {'upper': 29}
+
+@pytest.mark.parametrize('tenancy, days', [
+    ((day('2024-02-14'), None), 16),
+    ((None, day('2024-02-10')), 10),
+    ((day('2024-01-01'), day('2024-03-31')), 29),
+    ((day('2024-03-01'), None), 0),
+    ((None, day('2024-01-31')), 0),
+    ((day('2024-02-29'), day('2024-02-29')), 1),
+])
+def test_open_start_or_end_is_clipped_to_the_period(tenancy, days):
+    assert occupied_days(FEB_START, FEB_END, {'lower': [tenancy]}) == {'lower': days}
+
+def test_overlapping_tenancies_count_each_day_once():
+    tenancies = [(day('2024-02-01'), day('2024-02-15')), (day('2024-02-10'), day('2024-02-20'))]
+    assert occupied_days(FEB_START, FEB_END, {'upper': tenancies}) == {'upper': 20}
+
+def test_back_to_back_tenancies_are_joined():
+    tenancies = [(day('2024-02-01'), day('2024-02-14')), (day('2024-02-15'), None)]
+    assert occupied_days(FEB_START, FEB_END, {'upper': tenancies}) == {'upper': 29}
+
+def test_gap_between_tenancies_is_vacant():
+    tenancies = [(None, day('2024-02-09')), (day('2024-02-20'), None)]
+    assert occupied_days(FEB_START, FEB_END, {'upper': tenancies}) == {'upper': 19}
+
+def test_units_are_counted_independently():
+    units = {'upper': [(None, None)], 'lower': [(day('2024-02-14'), None)], 'basement': []}
+    assert occupied_days(FEB_START, FEB_END, units) == {'upper': 29, 'lower': 16, 'basement': 0}
+
+def test_occupancy_weights_keep_or_redistribute_vacancy():
+    assert occupancy_weights(29, [29, 16], [1, 1]) == [29, 16, 13]
+    assert occupancy_weights(29, [29, 16], [1, 1], redistribute_vacancy=True) == [29, 16, 0]
+    assert occupancy_weights(29, [0, 0], [1, 1], redistribute_vacancy=True) == [0, 0, 1]
+
+def test_split_cents_sums_to_total():
+    units = {'upper': [(None, None)], 'lower': [(day('2024-02-14'), None)]}
+    shares, vacant = split_cents(10000, FEB_START, FEB_END, units)
+    assert shares == {'upper': 5000, 'lower': 2759} and vacant == 2241
+    shares, vacant = split_cents(10000, FEB_START, FEB_END, units, redistribute_vacancy=True)
+    assert shares == {'upper': 6444, 'lower': 3556} and vacant == 0
+
+def test_split_cents_rejects_reversed_period():
+    with pytest.raises(ValueError):
+        split_cents(100, FEB_END, FEB_START, {'upper': [(None, None)]})